@@ -49,6 +49,7 @@ import re
 import wakepy
 import json
 import csv
+import threading
 import numpy as np
 import concurrent.futures
 
@@ -144,6 +145,11 @@ parser.add_argument(
     help="Number of workers for SSIMU2 CPU (fssimu2 or vs-zip) | Default: 4",
     default="4",
 )
+parser.add_argument(
+    "--vship-streams",
+    help="numStream for SSIMU2 via vs-hip (GPU) | Default: 3",
+    default="3",
+)
 parser.add_argument(
     "--workers", help="Number of Av1an workers | Default: 1", default="1"
 )
@@ -322,6 +328,7 @@ else:
     ssimu2 = args.ssimu2.lower()
 
 ssimu2_cpu_workers = int(args.ssimu2_cpu_workers)
+vship_streams = int(args.vship_streams)
 verbose = args.verbose
 resume = args.resume
 no_boosting = args.no_boosting
@@ -971,7 +978,7 @@ def calculate_metric() -> None:
 
             # Run Vship
             result = core.vship.SSIMULACRA2(
-                cut_source_clip, cut_encoded_clip, numStream=3
+                cut_source_clip, cut_encoded_clip, numStream=vship_streams
             )
 
             def get_ssimu2props_vship(n, f):
@@ -1047,25 +1054,32 @@ def calculate_metric() -> None:
                 format=vs.RGB24, matrix_in_s="709"
             )
 
+            pam_header = (
+                f"P7\n"
+                f"WIDTH {ref_rgb.width}\n"
+                f"HEIGHT {ref_rgb.height}\n"
+                f"DEPTH 3\n"
+                f"MAXVAL 255\n"
+                f"TUPLTYPE RGB\n"
+                f"ENDHDR\n"
+            ).encode()
+            pam_local = threading.local()
+
             # Helper function to write PAM
             def write_pam(frame, filepath):
-                width, height = frame.width, frame.height
-                r = np.asarray(frame[0])
-                g = np.asarray(frame[1])
-                b = np.asarray(frame[2])
-                packed = np.dstack((r, g, b)).tobytes()
-                header = (
-                    f"P7\n"
-                    f"WIDTH {width}\n"
-                    f"HEIGHT {height}\n"
-                    f"DEPTH 3\n"
-                    f"MAXVAL 255\n"
-                    f"TUPLTYPE RGB\n"
-                    f"ENDHDR\n"
-                ).encode()
+                # Interleave the planes straight into this worker thread's
+                # reusable header+pixels buffer, then write it in one go
+                if not hasattr(pam_local, "buf"):
+                    width, height = frame.width, frame.height
+                    pam_local.buf = bytearray(len(pam_header) + width * height * 3)
+                    pam_local.buf[: len(pam_header)] = pam_header
+                    pam_local.pixels = np.frombuffer(
+                        pam_local.buf, dtype=np.uint8, offset=len(pam_header)
+                    ).reshape(height, width, 3)
+                for plane in range(3):
+                    pam_local.pixels[..., plane] = np.asarray(frame[plane])
                 with open(filepath, "wb") as f:
-                    f.write(header)
-                    f.write(packed)
+                    f.write(pam_local.buf)
 
             # WORKER FUNCTION FOR PARALLEL EXECUTION
             def process_frame(n):
@@ -19,10 +19,12 @@ fi
 if [ -f "$CONFIG_FILE" ]; then
     SSIMU2_TOOL=$(grep "^tool=" "$CONFIG_FILE" | cut -d= -f2 | tr -d '\r')
     SSIMU2_WORKERS=$(grep "^workercount=" "$CONFIG_FILE" | cut -d= -f2 | tr -d '\r')
+    VSHIP_STREAMS=$(grep "^numstream=" "$CONFIG_FILE" | cut -d= -f2 | tr -d '\r')
 else
     SSIMU2_TOOL="vs-zip"
     SSIMU2_WORKERS=4
 fi
+VSHIP_STREAMS=${VSHIP_STREAMS:-3}
 
 echo "Starting Auto-Boost-Av1an with $WORKER_COUNT final-pass workers..."
 echo "SSIMU2 Mode: $SSIMU2_TOOL | SSIMU2 Workers: $SSIMU2_WORKERS"
@@ -61,6 +63,7 @@ for f in Input/*.mkv; do
         --aggressive \
         --ssimu2 "$SSIMU2_TOOL" \
         --ssimu2-cpu-workers "$SSIMU2_WORKERS" \
+        --vship-streams "$VSHIP_STREAMS" \
         --resume \
         --verbose \
         --photon-noise 2 \
@@ -6,6 +6,7 @@ import threading
 import queue
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import psutil
 
@@ -13,6 +14,11 @@ import psutil
 # Detect CPU threads and leave 1 free for system responsiveness
 TOTAL_THREADS = psutil.cpu_count(logical=True)
 PARALLELISM = max(1, TOTAL_THREADS - 1)
+# Concurrency lives in the worker slots; one thread per ffmpeg keeps
+# PARALLELISM encodes from oversubscribing the cores
+FFMPEG_THREADS_PER_WORKER = 1
+# mkvmerge is mostly disk-bound, so only a few muxes run at once
+MUX_WORKERS = min(4, PARALLELISM)
 
 IGNORE_EXTS = set()
 LOSSLESS_EXTS = {".flac", ".wav", ".thd", ".dtshd", ".pcm"}
@@ -22,9 +28,16 @@ LOSSLESS_EXTS = {".flac", ".wav", ".thd", ".dtshd", ".pcm"}
 slot_status = ["Idle"] * PARALLELISM
 files_queue = queue.Queue()
 stop_display = threading.Event()
+# Parsed `mkvmerge -J` output keyed by resolved path, with the mtime_ns and
+# size it was read at; extraction and muxing share one identify per file,
+# and the cache is kept on disk so re-runs skip unchanged files entirely
+mkv_info_cache = {}
+MKV_INFO_FILE = Path("ac3-output") / ".mkv_info.json"
 
 # Regex for FFMPEG progress parsing
 re_ffmpeg = re.compile(r"time=\s*(\S+).*bitrate=\s*(\S+).*speed=\s*(\S+)")
+# Extracted/encoded track files: <source stem>_track<id>_<lang>.<ext>
+re_track_file = re.compile(r"^(.+)_track(\d+)_([a-zA-Z0-9]+)\.([a-zA-Z0-9]+)$")
 
 # --- PATH SETUP (Relative to this script) ---
 # Location: Linux_Dist/tools/ac3.py
@@ -164,11 +177,41 @@ def get_user_choice():
 # --- PHASE 1: EXTRACTION ---
 
 
+def load_mkv_info_cache():
+    try:
+        with open(MKV_INFO_FILE, "r", encoding="utf-8") as f:
+            mkv_info_cache.update(json.load(f))
+    except (OSError, ValueError, TypeError):
+        pass
+
+
+def save_mkv_info_cache():
+    # Only keep entries for files that still exist
+    entries = {k: v for k, v in mkv_info_cache.items() if os.path.exists(k)}
+    try:
+        MKV_INFO_FILE.parent.mkdir(exist_ok=True)
+        with open(MKV_INFO_FILE, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+    except OSError:
+        pass
+
+
+def get_mkv_info(mkv_path):
+    """Returns the parsed `mkvmerge -J` output, identifying each file once."""
+    key = str(Path(mkv_path).resolve())
+    st = os.stat(key)
+    cached = mkv_info_cache.get(key)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    res = run_command([MKVMERGE_EXE, "-J", str(mkv_path)], capture_output=True)
+    data = json.loads(res)
+    mkv_info_cache[key] = [st.st_mtime_ns, st.st_size, data]
+    return data
+
+
 def get_mkv_tracks(mkv_path):
-    cmd = [MKVMERGE_EXE, "-J", str(mkv_path)]
     try:
-        res = run_command(cmd, capture_output=True)
-        data = json.loads(res)
+        data = get_mkv_info(mkv_path)
         return [t for t in data.get("tracks", []) if t["type"] == "audio"]
     except:
         return []
@@ -183,8 +226,14 @@ def extract_tracks():
     print(f"Found {len(mkvs)} MKV files. Analyzing tracks...")
     extracted_files = []
 
-    for mkv in mkvs:
-        tracks = get_mkv_tracks(mkv)
+    # Identify every file up front; extraction below stays serial so its
+    # progress line remains readable
+    load_mkv_info_cache()
+    with ThreadPoolExecutor(max_workers=PARALLELISM) as ex:
+        all_tracks = list(ex.map(get_mkv_tracks, mkvs))
+    save_mkv_info_cache()
+
+    for mkv, tracks in zip(mkvs, all_tracks):
         extract_cmds = []
 
         for track in tracks:
@@ -237,27 +286,30 @@ def extract_tracks():
 
 
 def display_loop():
-    last_line_count = 0
+    shown = []
     sys.stdout.write("\n")
 
     while not stop_display.is_set():
-        active_slots = [s for s in slot_status if s != "Idle"]
-        current_line_count = len(active_slots)
+        active_slots = [s[:110] for s in slot_status if s != "Idle"]
 
-        if last_line_count > 0:
-            sys.stdout.write(f"\033[{last_line_count}A")
+        # Repaint only when something changed, in a single write
+        if active_slots != shown:
+            out = []
+            if shown:
+                out.append(f"\033[{len(shown)}A")
 
-        for line in active_slots:
-            clean_line = line[:110]
-            sys.stdout.write(f"\r{clean_line}\033[K\n")
+            for line in active_slots:
+                out.append(f"\r{line}\033[K\n")
 
-        if current_line_count < last_line_count:
-            sys.stdout.write("\033[J")
+            if len(active_slots) < len(shown):
+                out.append("\033[J")
 
-        last_line_count = current_line_count
-        sys.stdout.flush()
+            sys.stdout.write("".join(out))
+            sys.stdout.flush()
+            shown = active_slots
         time.sleep(0.1)
 
+    last_line_count = len(shown)
     if last_line_count > 0:
         sys.stdout.write(f"\033[{last_line_count}A")
         sys.stdout.write("\033[J")
@@ -325,12 +377,16 @@ def worker_ac3(slot_id):
         cmd = [
             FFMPEG_EXE,
             "-y",
+            "-threads",
+            str(FFMPEG_THREADS_PER_WORKER),
             "-i",
             str(input_file),
             "-c:a",
             "ac3",
             "-b:a",
             bitrate_str,
+            "-threads",
+            str(FFMPEG_THREADS_PER_WORKER),
             str(output_file),
         ]
 
@@ -343,17 +399,15 @@ def worker_ac3(slot_id):
                 bufsize=1,
                 encoding="utf-8",
             )
-            while True:
-                chunk = proc.stderr.read(256)
-                if not chunk and proc.poll() is not None:
-                    break
-                if chunk:
-                    match = re_ffmpeg.search(chunk)
-                    if match:
-                        t, b, s = match.groups()
-                        slot_status[slot_id] = (
-                            f"{slot_id + 1}: [AC3] {fname}.. T:{t} Spd:{s} ({channels}ch)"
-                        )
+            # Text mode splits ffmpeg's "\r" progress updates into lines
+            for line in proc.stderr:
+                match = re_ffmpeg.search(line)
+                if match:
+                    t, b, s = match.groups()
+                    slot_status[slot_id] = (
+                        f"{slot_id + 1}: [AC3] {fname}.. T:{t} Spd:{s} ({channels}ch)"
+                    )
+            proc.wait()
         except Exception as e:
             slot_status[slot_id] = f"{slot_id + 1}: [Err] {str(e)[:20]}"
             continue
@@ -362,12 +416,24 @@ def worker_ac3(slot_id):
     slot_status[slot_id] = "Idle"
 
 
+def largest_first(files):
+    """Orders files biggest first so the longest encodes don't start last."""
+
+    def size(path):
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+
+    return sorted(files, key=size, reverse=True)
+
+
 def run_phase(files, worker_func, name):
     if not files:
         return
     print(f"\n--- Starting {name} ({len(files)} files) ---")
 
-    for f in files:
+    for f in largest_first(files):
         files_queue.put(f)
     for i in range(PARALLELISM):
         slot_status[i] = "Idle"
@@ -433,31 +499,31 @@ def mux_final_files():
 
     print(f"\n--- Starting Muxing Phase ---")
     files_processed = 0
+    mux_jobs = []
 
-    for mkv_path in current_dir.glob("*.mkv"):
-        safe_stem = re.escape(mkv_path.stem)
-
-        # Matches:  Video_track1_eng.ac3  OR  Video_track1_eng.thd
-        pattern = re.compile(
-            rf"^{safe_stem}_track(\d+)_([a-zA-Z0-9]+)\.([a-zA-Z0-9]+)$"
-        )
+    # Bucket track files by source stem in a single pass over the folder
+    # Matches:  Video_track1_eng.ac3  OR  Video_track1_eng.thd
+    track_files = {}
+    for f in current_dir.iterdir():
+        match = re_track_file.match(f.name)
+        if match:
+            track_files.setdefault(match.group(1), []).append((f, match))
 
+    for mkv_path in current_dir.glob("*.mkv"):
         track_candidates = {}
 
-        for f in current_dir.iterdir():
-            match = pattern.match(f.name)
-            if match:
-                t_num = int(match.group(1))
-                lang = match.group(2)
-                ext = match.group(3).lower()
+        for f, match in track_files.get(mkv_path.stem, ()):
+            t_num = int(match.group(2))
+            lang = match.group(3)
+            ext = match.group(4).lower()
 
-                if t_num not in track_candidates:
-                    track_candidates[t_num] = {"lang": lang, "ac3": None, "orig": None}
+            if t_num not in track_candidates:
+                track_candidates[t_num] = {"lang": lang, "ac3": None, "orig": None}
 
-                if ext == "ac3":
-                    track_candidates[t_num]["ac3"] = f
-                else:
-                    track_candidates[t_num]["orig"] = f
+            if ext == "ac3":
+                track_candidates[t_num]["ac3"] = f
+            else:
+                track_candidates[t_num]["orig"] = f
 
         if not track_candidates:
             print(f"Skipping {mkv_path.name} (No audio tracks identified)")
@@ -468,9 +534,7 @@ def mux_final_files():
 
         subtitle_flags = []
         try:
-            cmd = [MKVMERGE_EXE, "-J", str(mkv_path)]
-            res = run_command(cmd, capture_output=True)
-            file_info = json.loads(res)
+            file_info = get_mkv_info(mkv_path)
             for track in file_info.get("tracks", []):
                 if track.get("type") == "subtitles":
                     tid = track.get("id")
@@ -520,10 +584,21 @@ def mux_final_files():
                 ]
             )
 
-        if run_with_progress(cmd):
+        mux_jobs.append((mkv_path.name, cmd))
+
+    # A lone mux keeps its live progress line; several run side by side
+    # quietly, since their progress lines would garble each other
+    if len(mux_jobs) == 1:
+        results = [run_with_progress(mux_jobs[0][1])]
+    else:
+        with ThreadPoolExecutor(max_workers=MUX_WORKERS) as ex:
+            results = list(ex.map(run_command, [cmd for _, cmd in mux_jobs]))
+
+    for (name, _), ok in zip(mux_jobs, results):
+        if ok:
             files_processed += 1
         else:
-            print("  > Error during muxing (check logs).")
+            print(f"  > Error during muxing {name} (check logs).")
 
     print(f"\nAll done. Processed {files_processed} videos into 'ac3-output'.")
 
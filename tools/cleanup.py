@@ -1,5 +1,15 @@
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _remove_dir(path):
+    # shutil.rmtree refuses symlinked folders and guards against symlink swaps
+    try:
+        shutil.rmtree(path)
+        return True
+    except OSError:
+        return False
 
 
 def cleanup_workspace():
@@ -7,7 +17,7 @@ def cleanup_workspace():
     scan_dirs = [".", "Input", "Output"]
 
     # Extensions to delete (Files)
-    extensions = [
+    extensions = (
         ".ffindex",
         ".lwi",
         ".json",
@@ -18,21 +28,37 @@ def cleanup_workspace():
         ".mbtree",
         ".zone",
         ".csv",
-    ]
+    )
+
+    # Whitelist: Critical system/project folders to never touch
+    protected_dirs = {
+        ".git",
+        ".vscode",
+        ".idea",
+        "Input",
+        "Output",
+        "tools",
+        "VapourSynth",
+        "__pycache__",
+        "venv",
+    }
 
     print("Cleaning up workspace...")
 
+    temp_dirs = []
+
     for d in scan_dirs:
         if not os.path.exists(d):
             continue
 
-        for item in os.listdir(d):
-            item_path = os.path.join(d, item)
+        with os.scandir(d) as it:
+            for entry in it:
+                item = entry.name
+                item_path = entry.path
 
-            # 1. DELETE FILES
-            if os.path.isfile(item_path):
-                for ext in extensions:
-                    if item.lower().endswith(ext):
+                # 1. DELETE FILES
+                if entry.is_file():
+                    if item.lower().endswith(extensions):
                         try:
                             # Avoid deleting scenes json if needed?
                             # Usually cleanup removes json scenes. User accepted this behavior.
@@ -40,35 +66,22 @@ def cleanup_workspace():
                             print(f"Deleted: {item_path}")
                         except:
                             pass
-                        break
-
-            # 2. DELETE DIRECTORIES (Temp folders)
-            elif os.path.isdir(item_path):
-                # Whitelist: Critical system/project folders to never touch
-                if item in [
-                    ".git",
-                    ".vscode",
-                    ".idea",
-                    "Input",
-                    "Output",
-                    "tools",
-                    "VapourSynth",
-                    "__pycache__",
-                    "venv",
-                ]:
-                    continue
-
-                # Condition: Starts with "." (Hidden temp) OR ends with ".tmp" OR ends with "-source"
-                if (
-                    item.startswith(".")
-                    or item.endswith(".tmp")
-                    or item.endswith("-source")
-                ):
-                    try:
-                        shutil.rmtree(item_path)
-                        print(f"Deleted temp dir: {item_path}")
-                    except:
-                        pass
+
+                # 2. DELETE DIRECTORIES (Temp folders)
+                elif entry.is_dir():
+                    if item in protected_dirs:
+                        continue
+
+                    # Condition: Starts with "." (Hidden temp) OR ends with ".tmp" OR ends with "-source"
+                    if item.startswith(".") or item.endswith((".tmp", "-source")):
+                        temp_dirs.append(item_path)
+
+    # Temp trees can hold thousands of chunk files; delete them concurrently
+    if temp_dirs:
+        with ThreadPoolExecutor(max_workers=min(8, len(temp_dirs))) as ex:
+            for item_path, ok in zip(temp_dirs, ex.map(_remove_dir, temp_dirs)):
+                if ok:
+                    print(f"Deleted temp dir: {item_path}")
 
 
 if __name__ == "__main__":
@@ -10,17 +10,43 @@ import threading
 FOLDERS_TO_CHECK = ["VapourSynth", "tools"]
 
 
-def get_dir_size(path):
+def scan_dir(path):
+    """Returns (file_count, total_bytes, disk_bytes) using one stat per file.
+
+    Hidden directories are pruned instead of descended into.
+
+    disk_bytes comes from st_blocks, i.e. the space actually allocated, which
+    is what shrinks under filesystem compression (the Linux counterpart of
+    GetCompressedFileSizeW).
+    """
+    count = 0
     total = 0
-    try:
-        # Use simple os.walk to be cross-platform python
-        for root, dirs, files in os.walk(path):
-            for f in files:
-                fp = os.path.join(root, f)
-                total += os.path.getsize(fp)
-    except Exception:
-        pass
-    return total
+    disk = 0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            # Hidden dirs (.git, caches) are not part of the tools
+                            if not entry.name.startswith("."):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            count += 1
+                            total += st.st_size
+                            disk += st.st_blocks * 512
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return count, total, disk
+
+
+def get_dir_size(path):
+    return scan_dir(path)[1]
 
 
 def format_size(size_bytes):
@@ -31,20 +57,19 @@ def main():
     print("Checking disk usage for tools...")
 
     total_bytes = 0
+    total_disk = 0
     file_count = 0
 
     for folder in FOLDERS_TO_CHECK:
         if os.path.exists(folder):
-            c = 0
-            size = 0
-            for root, dirs, files in os.walk(folder):
-                for f in files:
-                    c += 1
-                    fp = os.path.join(root, f)
-                    size += os.path.getsize(fp)
-
-            print(f"Folder '{folder}': {c} files, {format_size(size)}")
+            c, size, disk = scan_dir(folder)
+
+            print(
+                f"Folder '{folder}': {c} files, {format_size(size)} "
+                f"({format_size(disk)} on disk)"
+            )
             total_bytes += size
+            total_disk += disk
             file_count += c
         else:
             print(f"Folder '{folder}' not found (skipped).")
@@ -52,6 +77,7 @@ def main():
     print("-" * 60)
     print(f"Total Files: {file_count}")
     print(f"Total Size:  {format_size(total_bytes)}")
+    print(f"On Disk:     {format_size(total_disk)}")
     print("-" * 60)
     print("NOTE: 'compact' compression is Windows-specific.")
     print("On Linux, use filesystem compression (btrfs/zfs) or standard archives.")
@@ -12,30 +12,58 @@ Merged from robust_autocrop.py and autocrop.py.
 from __future__ import annotations
 
 import argparse
+import atexit
 import csv
 import json
 import math
 import os
 import re
+import selectors
 import shutil
 import subprocess
 import sys
-from collections import Counter, defaultdict
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
 # --- VapourSynth / NumPy Imports (Lazy loaded or try/except to maintain portability) ---
 try:
     import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
     import vapoursynth as vs
 
-    VS_AVAILABLE = True
+    VS_AVAILABLE = NUMPY_AVAILABLE
 except ImportError:
     VS_AVAILABLE = False
 
-# --- Constants & Regex ---
-CROP_RE = re.compile(r"\bcrop=(\d+):(\d+):(\d+):(\d+)\b")
+# Optional: Numba JIT for the early-exit bounding box scan (NumPy path otherwise)
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# --- Constants ---
+# cropdetect sets x1, x2, y1, y2, w, h, x, y in that order, and
+# metadata=mode=print writes one key=value line each
+META_CROP_RE = re.compile(
+    rb"^lavfi\.cropdetect\.w=(\d+)\n"
+    rb"lavfi\.cropdetect\.h=(\d+)\n"
+    rb"lavfi\.cropdetect\.x=(\d+)\n"
+    rb"lavfi\.cropdetect\.y=(\d+)$",
+    re.MULTILINE,
+)
 VIDEO_DEFAULT_EXTS = {
     ".mp4",
     ".mkv",
@@ -50,6 +78,34 @@ VIDEO_DEFAULT_EXTS = {
     ".wmv",
 }
 TEMP_DIR_NAME = "cropdetect-temp"
+# Shared by every working folder, unlike the per-run temp dir
+PROBE_CACHE_PATH = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "auto-boost"
+    / "probe.json"
+)
+
+
+def env_max_procs():
+    """AB_MAX_PROCS if it is a positive integer, else half the CPU threads (min 2)."""
+    try:
+        value = int(os.environ.get("AB_MAX_PROCS", ""))
+    except ValueError:
+        value = 0
+    return value if value > 0 else max(2, (os.cpu_count() or 2) // 2)
+
+
+# Each ffmpeg decodes with FFMPEG_THREADS threads; run half as many jobs as cores.
+# AB_MAX_PROCS caps the ffmpeg children alive at once across all videos (the
+# ffprobe pool runs on its own, before any ffmpeg starts).
+FFMPEG_THREADS = 2
+FFMPEG_WORKERS = env_max_procs()
+PROBE_WORKERS = FFMPEG_WORKERS
+# Inputs (each with its own decoder) batched into one ffmpeg process
+SEGMENTS_PER_PROC = 4
+# Absolute paths let subprocess use posix_spawn instead of fork+exec
+FFMPEG_BIN = shutil.which("ffmpeg") or "ffmpeg"
+FFPROBE_BIN = shutil.which("ffprobe") or "ffprobe"
 
 
 @dataclass
@@ -94,6 +150,36 @@ def setup_temp_dir():
     return temp_path
 
 
+# ffprobe results keyed by "resolved path|mtime_ns|size", kept across runs
+_probe_cache: Dict[str, dict] = {}
+_probe_cache_dirty = False
+
+
+def load_probe_cache():
+    global _probe_cache
+    try:
+        with open(PROBE_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            _probe_cache = data
+    except (OSError, ValueError):
+        pass
+
+
+def save_probe_cache():
+    if not _probe_cache_dirty:
+        return
+    # Write to a temp file and rename, so concurrent runs never see a torn file
+    tmp_path = PROBE_CACHE_PATH.with_name(f"{PROBE_CACHE_PATH.name}.{os.getpid()}.tmp")
+    try:
+        PROBE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_probe_cache, f)
+        os.replace(tmp_path, PROBE_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: Could not save probe cache: {e}", file=sys.stderr)
+
+
 def run_cmd(cmd: List[str], timeout: int = 120) -> subprocess.CompletedProcess:
     return subprocess.run(
         cmd,
@@ -103,12 +189,30 @@ def run_cmd(cmd: List[str], timeout: int = 120) -> subprocess.CompletedProcess:
         encoding="utf-8",
         timeout=timeout,
         check=False,
+        # Our own fds are non-inheritable anyway; close_fds=True disables posix_spawn
+        close_fds=False,
     )
 
 
 def ffprobe_info(path: Path) -> Optional[VideoInfo]:
+    global _probe_cache_dirty
+    try:
+        st = path.stat()
+        cache_key = f"{path.resolve()}|{st.st_mtime_ns}|{st.st_size}"
+    except OSError:
+        cache_key = None
+
+    cached = _probe_cache.get(cache_key) if cache_key else None
+    if cached:
+        return VideoInfo(
+            path=path,
+            width=cached["width"],
+            height=cached["height"],
+            duration=cached["duration"],
+        )
+
     cmd = [
-        "ffprobe",
+        FFPROBE_BIN,
         "-v",
         "error",
         "-select_streams",
@@ -133,19 +237,36 @@ def ffprobe_info(path: Path) -> Optional[VideoInfo]:
         dur = float(data.get("format", {}).get("duration", 0) or 0.0)
         if w <= 0 or h <= 0:
             return None
+        if cache_key:
+            _probe_cache[cache_key] = {"width": w, "height": h, "duration": dur}
+            _probe_cache_dirty = True
         return VideoInfo(path=path, width=w, height=h, duration=dur)
     except Exception:
         return None
 
 
-def sample_timestamps(duration: float, n: int) -> List[float]:
-    if duration and duration > 10:
+@lru_cache(maxsize=1024)
+def _timestamps(duration_ds: int, n: int) -> Tuple[float, ...]:
+    # Keyed on tenths of a second so episodes of the same length share an entry
+    duration = duration_ds / 10
+    if duration > 10:
         start = max(0.5, duration * 0.05)
         end = max(start + 1.0, duration * 0.95)
         if end <= start:
-            return [start]
-        return [start + (end - start) * (i / (n - 1)) for i in range(n)]
-    return [0.5, 3.0, 8.0, 15.0][: max(1, min(n, 4))]
+            return (start,)
+        if NUMPY_AVAILABLE:
+            # linspace hits both endpoints exactly
+            return tuple(np.linspace(start, end, n).tolist())
+        return tuple(start + (end - start) * (i / (n - 1)) for i in range(n))
+    fixed = (0.5, 3.0, 8.0, 15.0)[: max(1, min(n, 4))]
+    if duration > 0:
+        # A seek past EOF would fail the whole batched ffmpeg run
+        fixed = tuple(t for t in fixed if t < duration) or (0.0,)
+    return fixed
+
+
+def sample_timestamps(duration: float, n: int) -> List[float]:
+    return list(_timestamps(round((duration or 0) * 10), n))
 
 
 def area(w: int, h: int) -> int:
@@ -179,72 +300,192 @@ def load_settings() -> dict:
 # ============================================================================
 
 
-def run_cropdetect_segment(
-    video: Path, ss: float, seg: float, fps: float, limit: float, round_to: int
-) -> List[Tuple[int, int, int, int]]:
-    vf = f"fps={fps},format=yuv444p,cropdetect=limit={limit}:round={round_to}:reset=0"
+def parse_cropdetect_metadata(data: bytes) -> List[Tuple[int, int, int, int]]:
+    """Parses raw metadata=mode=print output into (w, h, x, y) crops.
+
+    Works on bytes so the pipe output is never decoded, and lets a single
+    findall pick every record out of the buffer.
+    """
+    return [
+        (int(w), int(h), int(x), int(y)) for w, h, x, y in META_CROP_RE.findall(data)
+    ]
+
+
+def run_cropdetect_segments(
+    video: Path,
+    starts: List[float],
+    seg: float,
+    fps: float,
+    limits: List[float],
+    round_to: int,
+) -> Dict[float, List[Tuple[int, int, int, int]]]:
+    """Runs every cropdetect limit over several segments in one ffmpeg process.
+
+    Each segment is a separate fast-seeked input with its own filter chain,
+    split into one cropdetect instance per limit, so a detector only ever
+    sees frames from its own segment. Each instance prints its frame
+    metadata to its own pipe, so results arrive as key=value records already
+    attributed to their limit, without the ffmpeg log in between.
+    """
+    n = len(limits)
+    # One pipe per (segment, limit) chain, remembering which limit it feeds
+    pipes = [os.pipe() for _ in range(len(starts) * n)]
+    pipe_limits = [lim for _ in starts for lim in limits]
+
+    chains = []
+    for k in range(len(starts)):
+        chains.append(
+            f"[{k}:v:0]fps={fps},format=yuv444p,split={n}"
+            + "".join(f"[v{k}_{i}]" for i in range(n))
+        )
+        for i, lim in enumerate(limits):
+            fd = pipes[k * n + i][1]
+            chains.append(
+                f"[v{k}_{i}]cropdetect=limit={lim}:round={round_to}:reset=0,"
+                f"metadata=mode=print:file=/dev/fd/{fd}[o{k}_{i}]"
+            )
+    graph = ";".join(chains)
+
     cmd = [
-        "ffmpeg",
+        FFMPEG_BIN,
         "-hide_banner",
         "-loglevel",
-        "info",
-        "-ss",
-        f"{ss:.3f}",
-        "-i",
-        str(video),
-        "-t",
-        f"{seg:.3f}",
-        "-vf",
-        vf,
-        "-an",
-        "-sn",
-        "-dn",
-        "-f",
-        "null",
-        "-",
+        "error",
     ]
-    p = run_cmd(cmd, timeout=max(60, int(seg * 10) + 30))
-    text = (p.stderr or "") + "\n" + (p.stdout or "")
-    crops = []
-    for m in CROP_RE.finditer(text):
-        crops.append(tuple(map(int, m.groups())))
-    return crops
+    for ss in starts:
+        # -an/-sn/-dn on the input make the demuxer drop those packets up front
+        cmd += [
+            "-threads",
+            str(FFMPEG_THREADS),
+            "-an",
+            "-sn",
+            "-dn",
+            "-ss",
+            f"{ss:.3f}",
+            "-t",
+            f"{seg:.3f}",
+            "-i",
+            str(video),
+        ]
+    cmd += ["-filter_complex", graph]
+    for k in range(len(starts)):
+        for i in range(n):
+            cmd += ["-map", f"[o{k}_{i}]", "-f", "null", "-"]
+
+    chunks: Dict[int, List[bytes]] = {r: [] for r, _ in pipes}
+    try:
+        p = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            pass_fds=[w for _, w in pipes],
+        )
+    except OSError:
+        for r, w in pipes:
+            os.close(r)
+            os.close(w)
+        return {lim: [] for lim in limits}
+
+    for _, w in pipes:
+        os.close(w)
+
+    # Drain all pipes together so no instance can block on a full pipe
+    deadline = time.monotonic() + max(60, int(seg * len(starts) * 10) + 30)
+    timed_out = False
+    with selectors.DefaultSelector() as sel:
+        for r, _ in pipes:
+            sel.register(r, selectors.EVENT_READ)
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                p.kill()
+                timed_out = True
+                break
+            for key, _ in sel.select(timeout=remaining):
+                chunk = os.read(key.fd, 65536)
+                if chunk:
+                    chunks[key.fd].append(chunk)
+                else:
+                    sel.unregister(key.fd)
+
+    for r, _ in pipes:
+        os.close(r)
+    p.wait()
+
+    if p.returncode != 0 and not timed_out and len(starts) > 1:
+        # One bad input fails the whole batch; retry the samples one by one
+        merged: Dict[float, List[Tuple[int, int, int, int]]] = {
+            lim: [] for lim in limits
+        }
+        for ss in starts:
+            single = run_cropdetect_segments(video, [ss], seg, fps, limits, round_to)
+            for lim, crops in single.items():
+                merged[lim].extend(crops)
+        return merged
+
+    results: Dict[float, List[Tuple[int, int, int, int]]] = {
+        lim: [] for lim in limits
+    }
+    for (r, _), lim in zip(pipes, pipe_limits):
+        results[lim].extend(parse_cropdetect_metadata(b"".join(chunks[r])))
+    return results
 
 
 def choose_best_crop(
-    vi: VideoInfo, observed: Counter, crop_to_limits: Dict[str, set]
+    vi: VideoInfo, stats: Dict[Tuple[int, int, int, int], list], total: int
 ) -> Optional[CropResult]:
-    if not observed:
+    """Scores each distinct crop. stats maps (w, h, x, y) -> [count, limits]."""
+    if not stats:
         return None
     full_area = area(vi.width, vi.height)
-    best = None
-    best_score = -1e18
-    total = sum(observed.values())
-
-    for crop_str, count in observed.items():
-        w, h, x, y = map(int, crop_str.split(":"))
-        a = area(w, h)
-        if a <= 0 or a > full_area:
-            continue
-
-        freq = count / max(1, total)
-        ar = a / full_area
-        lim_support = len(crop_to_limits.get(crop_str, set()))
-        score = (freq * 1000.0) + (ar * 50.0) + (lim_support * 15.0)
-
+    freq_scale = 1.0 / max(1, total)
+    area_scale = 50.0 / full_area
+
+    if NUMPY_AVAILABLE:
+        crops = list(stats)
+        dims = np.array(crops, dtype=np.int64)
+        counts = np.fromiter((v[0] for v in stats.values()), np.float64, len(crops))
+        support = np.fromiter(
+            (len(v[1]) for v in stats.values()), np.float64, len(crops)
+        )
+        areas = dims[:, 0] * dims[:, 1]
+        score = counts * (freq_scale * 1000.0) + areas * area_scale + support * 15.0
         # Penalize full frame slightly to prefer actual crops if they are prevalent
-        if w == vi.width and h == vi.height and x == 0 and y == 0:
-            score -= 5.0
+        score[np.all(dims == (vi.width, vi.height, 0, 0), axis=1)] -= 5.0
+        score[(areas <= 0) | (areas > full_area)] = -np.inf
+
+        i = int(score.argmax())
+        best = crops[i] if np.isfinite(score[i]) else None
+    else:
+        best = None
+        best_score = -1e18
+        for crop, (count, crop_limits) in stats.items():
+            w, h, x, y = crop
+            a = area(w, h)
+            if a <= 0 or a > full_area:
+                continue
+
+            score = (
+                (count * freq_scale * 1000.0)
+                + (a * area_scale)
+                + (len(crop_limits) * 15.0)
+            )
 
-        if score > best_score:
-            best_score = score
-            best = (crop_str, w, h, x, y, freq, total, lim_support)
+            # Penalize full frame slightly to prefer actual crops if they are prevalent
+            if w == vi.width and h == vi.height and x == 0 and y == 0:
+                score -= 5.0
+
+            if score > best_score:
+                best_score = score
+                best = crop
 
     if best is None:
         return None
 
-    crop_str, w, h, x, y, freq, total, lim_support = best
-    limits = sorted(crop_to_limits.get(crop_str, set()))
+    w, h, x, y = best
+    count, crop_limits = stats[best]
+    lim_support = len(crop_limits)
     notes = (
         "strong"
         if lim_support >= 3
@@ -253,14 +494,14 @@ def choose_best_crop(
         else "single-threshold"
     )
     return CropResult(
-        crop_str,
+        f"{w}:{h}:{x}:{y}",
         w,
         h,
         x,
         y,
-        freq,
+        count * freq_scale,
         total,
-        [float(v) for v in limits],
+        [float(v) for v in sorted(crop_limits)],
         f"{notes} agreement",
     )
 
@@ -273,26 +514,48 @@ def detect_ffmpeg(
     limits: List[float],
     round_to: int,
     progress_mode: bool,
+    workers: int = FFMPEG_WORKERS,
 ) -> Optional[CropResult]:
     timestamps = sample_timestamps(vi.duration, sample_count)
-    observed: Counter = Counter()
-    crop_to_limits: Dict[str, set] = defaultdict(set)
-    total_steps = len(limits) * len(timestamps)
+    stats: Dict[Tuple[int, int, int, int], list] = {}
+    total = 0
+
+    # Interleaved shares of the samples, one ffmpeg each; at most
+    # SEGMENTS_PER_PROC decoders per process, at most `workers` processes alive
+    groups = max(workers, -(-len(timestamps) // SEGMENTS_PER_PROC))
+    groups = max(1, min(groups, len(timestamps)))
+    batches = [timestamps[i::groups] for i in range(groups)]
     current_step = 0
 
-    for lim in limits:
-        for ts in timestamps:
-            crops = run_cropdetect_segment(vi.path, ts, segment_len, fps, lim, round_to)
-            for w, h, x, y in crops:
-                c = f"{w}:{h}:{x}:{y}"
-                observed[c] += 1
-                crop_to_limits[c].add(lim)
+    with ThreadPoolExecutor(max_workers=min(workers, groups)) as ex:
+        futures = [
+            ex.submit(
+                run_cropdetect_segments,
+                vi.path,
+                batch,
+                segment_len,
+                fps,
+                limits,
+                round_to,
+            )
+            for batch in batches
+        ]
+        for fut in as_completed(futures):
+            for lim, crops in fut.result().items():
+                total += len(crops)
+                for crop in crops:
+                    entry = stats.get(crop)
+                    if entry is None:
+                        stats[crop] = [1, {lim}]
+                    else:
+                        entry[0] += 1
+                        entry[1].add(lim)
 
             if progress_mode:
                 current_step += 1
-                print(f"PROGRESS:{int((current_step / total_steps) * 100)}", flush=True)
+                print(f"PROGRESS:{int((current_step / groups) * 100)}", flush=True)
 
-    return choose_best_crop(vi, observed, crop_to_limits)
+    return choose_best_crop(vi, stats, total)
 
 
 # ============================================================================
@@ -300,38 +563,112 @@ def detect_ffmpeg(
 # ============================================================================
 
 
-def get_hsl_luminance(frame_rgb):
-    """Replicates VB.NET ColorHSL.L: (Max + Min) / 2."""
-    r, g, b = frame_rgb[:, :, 0], frame_rgb[:, :, 1], frame_rgb[:, :, 2]
-    c_max = np.maximum(np.maximum(r, g), b)
-    c_min = np.minimum(np.minimum(r, g), b)
-    return (c_max + c_min) / 2.0
+def _scan_bbox(luma, thresh):
+    """Walks inward from each edge and stops at the first content pixel.
 
+    Returns (left, top, right, bottom) margins.
+    """
+    height, width = luma.shape
 
-def vs_scan_frame(frame, threshold):
-    width = frame.width
-    height = frame.height
+    top = -1
+    for y in range(height):
+        for x in range(width):
+            if luma[y, x] >= thresh:
+                top = y
+                break
+        if top >= 0:
+            break
+    if top < 0:
+        return height // 2, height // 2, width // 2, width // 2
 
-    # Use legacy frame access for compatibility with all VS versions
-    planes = [np.asarray(frame[i]) for i in range(frame.format.num_planes)]
-    img_data = np.dstack(planes)
+    bottom = 0
+    for y in range(height - 1, top - 1, -1):
+        found = False
+        for x in range(width):
+            if luma[y, x] >= thresh:
+                found = True
+                break
+        if found:
+            bottom = height - 1 - y
+            break
+
+    last_row = height - bottom
+    left = 0
+    for x in range(width):
+        found = False
+        for y in range(top, last_row):
+            if luma[y, x] >= thresh:
+                found = True
+                break
+        if found:
+            left = x
+            break
+
+    right = 0
+    for x in range(width - 1, left - 1, -1):
+        found = False
+        for y in range(top, last_row):
+            if luma[y, x] >= thresh:
+                found = True
+                break
+        if found:
+            right = width - 1 - x
+            break
 
-    # img_data is float32 0.0-1.0 because we force RGBS in the generator
-    lum_map = get_hsl_luminance(img_data)
-    is_content = lum_map >= threshold
+    return left, top, right, bottom
 
-    rows = np.any(is_content, axis=1)
-    if not np.any(rows):
-        return height // 2, height // 2, width // 2, width // 2
 
-    top = np.argmax(rows)
-    bottom = np.argmax(rows[::-1])
+if NUMBA_AVAILABLE:
+    _scan_bbox = njit(cache=True, boundscheck=False)(_scan_bbox)
 
-    cols = np.any(is_content, axis=0)
-    left = np.argmax(cols)
-    right = np.argmax(cols[::-1])
 
-    return left, top, right, bottom
+class FrameScanner:
+    """Finds the content bounding box of frames of a fixed size and format.
+
+    Only the luma plane is read, at its native integer depth. The scratch
+    buffers are reused across frames, so the hot loop does not allocate.
+    """
+
+    def __init__(self, width: int, height: int, bits: int):
+        self.width = width
+        self.height = height
+        self.bits = bits
+        self.mask = np.empty((height, width), dtype=bool)
+        self.rows = np.empty(height, dtype=bool)
+        self.cols = np.empty(width, dtype=bool)
+
+    def luma_threshold(self, threshold: float, full_range: bool) -> int:
+        """Maps a 0.0-1.0 luminance threshold to a code value of this clip."""
+        if full_range:
+            return round(threshold * ((1 << self.bits) - 1))
+        return round((16 + threshold * 219) * (1 << (self.bits - 8)))
+
+    def scan(self, frame, threshold):
+        width = self.width
+        height = self.height
+
+        # Use legacy frame access for compatibility with all VS versions
+        luma = np.asarray(frame[0])
+        full_range = frame.props.get("_ColorRange", 1) == 0
+        thresh = self.luma_threshold(threshold, full_range)
+
+        if NUMBA_AVAILABLE:
+            return _scan_bbox(luma, thresh)
+
+        is_content = np.greater_equal(luma, thresh, out=self.mask)
+
+        rows = np.any(is_content, axis=1, out=self.rows)
+        if not rows.any():
+            return height // 2, height // 2, width // 2, width // 2
+
+        top = np.argmax(rows)
+        bottom = np.argmax(rows[::-1])
+
+        cols = np.any(is_content, axis=0, out=self.cols)
+        left = np.argmax(cols)
+        right = np.argmax(cols[::-1])
+
+        return left, top, right, bottom
 
 
 def detect_vapoursynth(
@@ -343,73 +680,29 @@ def detect_vapoursynth(
 
     temp_dir = Path(TEMP_DIR_NAME).resolve()
 
-    # 1. Generate a temporary VapourSynth Script
+    # 1. Load the source directly in this process
     # We use FFMS2 to index the file into the temp directory
     index_file = temp_dir / (vi.path.name + ".ffindex")
-    vpy_file = temp_dir / "temp_analysis.vpy"
-
-    # FIX: Clean and Sanitize Paths
-    # Remove Windows Long Path prefix (\\?\) if present, as it confuses some VS plugins
-    raw_vid_path = str(vi.path)
-    if raw_vid_path.startswith("\\\\?\\"):
-        raw_vid_path = raw_vid_path[4:]
-    # Use Forward Slashes to safely pass through Python string formatting without escaping hell
-    vid_path_str = raw_vid_path.replace("\\", "/")
-
-    raw_idx_path = str(index_file)
-    if raw_idx_path.startswith("\\\\?\\"):
-        raw_idx_path = raw_idx_path[4:]
-    idx_path_str = raw_idx_path.replace("\\", "/")
-
-    # Script content: Load -> Resize to Planar RGB Float (RGBS) -> Output
-    script_content = f"""
-import vapoursynth as vs
-core = vs.core
-# Try loading via ffms2 (standard for staxrip/portables)
-try:
-    clip = core.ffms2.Source(source=r"{vid_path_str}", cachefile=r"{idx_path_str}")
-except AttributeError:
-    # Fallback to lsmas if ffms2 missing
-    try:
-        clip = core.lsmas.LWLibavSource(source=r"{vid_path_str}", cache=0)
-    except AttributeError:
-        # Final fallback: explicit load (unlikely needed in portable, but safe)
-        raise RuntimeError("Neither ffms2 nor lsmas plugins found.")
-
-# Resize to Planar RGB Float for NumPy analysis
-# This ensures 0.0-1.0 range and 3 separate planes
-clip = clip.resize.Bicubic(format=vs.RGBS, matrix_in_s="709")
-clip.set_output()
-"""
-    try:
-        with open(vpy_file, "w", encoding="utf-8") as f:
-            f.write(script_content)
-    except Exception as e:
-        print(f"Error creating temp VPY: {e}", file=sys.stderr)
-        return None
 
-    # 2. Execute VapourSynth Environment
-    # We must run this within the current python process to use the 'autocrop' logic
     try:
-        from runpy import run_path
+        core = vs.core
+        # Try loading via ffms2 (standard for staxrip/portables)
+        try:
+            clip = core.ffms2.Source(source=str(vi.path), cachefile=str(index_file))
+        except AttributeError:
+            # Fallback to lsmas if ffms2 missing
+            try:
+                clip = core.lsmas.LWLibavSource(source=str(vi.path), cache=0)
+            except AttributeError:
+                raise RuntimeError("Neither ffms2 nor lsmas plugins found.")
 
-        # Run the generated script
-        run_path(str(vpy_file))
+        # Only luma is analyzed, so YUV/GRAY sources are read as-is; anything
+        # else (e.g. RGB) is converted to 8-bit gray once here
+        fmt = clip.format
+        if fmt.color_family not in (vs.YUV, vs.GRAY) or fmt.sample_type != vs.INTEGER:
+            clip = clip.resize.Bicubic(format=vs.GRAY8, matrix_s="709")
 
-        # Get Output (Safe Fallback Logic)
-        try:
-            clip = vs.get_output(0)
-        except (AttributeError, KeyError, ValueError):
-            # Fallback for different VS API versions
-            outputs = vs.get_outputs()
-            if not outputs:
-                raise RuntimeError("No output clip found.")
-            clip = outputs[0]
-
-        if isinstance(clip, tuple) or hasattr(clip, "clip"):
-            clip = clip.clip
-
-        # 3. Determine Frames to Analyze (Logic from autocrop.py)
+        # 2. Determine Frames to Analyze (Logic from autocrop.py)
         frame_count = clip.num_frames
         fps = clip.fps_num / clip.fps_den
 
@@ -440,17 +733,26 @@ clip.set_output()
             analyze_frames.append(curr)
             curr += interval
 
-        # 4. Analyze Loop
+        # 3. Analyze Loop
         lum_thresh_float = lum_thresh_int / 10000.0
 
-        min_left = clip.width
-        min_top = clip.height
-        min_right = clip.width
-        min_bottom = clip.height
+        # Running (left, top, right, bottom) minima, updated in place per frame
+        min_margins = np.array(
+            [clip.width, clip.height, clip.width, clip.height], dtype=np.int64
+        )
 
         total_frames = len(analyze_frames)
+        scanner = FrameScanner(clip.width, clip.height, clip.format.bits_per_sample)
+
+        # Keep a window of frame requests in flight so VapourSynth decodes the
+        # next frames while the current one is scanned
+        window = max(1, os.cpu_count() or 1)
+        frames_iter = iter(analyze_frames)
+        pending = deque(
+            clip.get_frame_async(fnum) for fnum in islice(frames_iter, window)
+        )
 
-        for i, fnum in enumerate(analyze_frames):
+        for i in range(total_frames):
             if progress_mode:
                 # Flush ensures the parent process sees the update immediately
                 print(f"PROGRESS:{int((i / total_frames) * 100)}", flush=True)
@@ -458,24 +760,33 @@ clip.set_output()
                 sys.stdout.write(f"\\rVS Analysis: {int((i / total_frames) * 100)}%   ")
                 sys.stdout.flush()
 
-            frame = clip.get_frame(fnum)
-            l, t, r, b = vs_scan_frame(frame, lum_thresh_float)
+            frame = pending.popleft().result()
+            next_fnum = next(frames_iter, None)
+            if next_fnum is not None:
+                pending.append(clip.get_frame_async(next_fnum))
 
-            min_left = min(min_left, l)
-            min_top = min(min_top, t)
-            min_right = min(min_right, r)
-            min_bottom = min(min_bottom, b)
+            np.minimum(
+                min_margins, scanner.scan(frame, lum_thresh_float), out=min_margins
+            )
 
             # Optimization: Stop if full frame found
-            if min_left == 0 and min_top == 0 and min_right == 0 and min_bottom == 0:
+            if not min_margins.any():
                 break
 
+        # Let any requests still in flight finish before the clip is released
+        for fut in pending:
+            try:
+                fut.result()
+            except Exception:
+                pass
+
         if progress_mode:
             print("PROGRESS:100", flush=True)
         else:
             sys.stdout.write("\\rVS Analysis: Done.      \\n")
 
-        # 5. Format Result
+        # 4. Format Result
+        min_left, min_top, min_right, min_bottom = (int(v) for v in min_margins)
         final_w = clip.width - min_left - min_right
         final_h = clip.height - min_top - min_bottom
         crop_str = f"{final_w}:{final_h}:{min_left}:{min_top}"
@@ -503,35 +814,156 @@ clip.set_output()
 # ============================================================================
 
 
+def _iter_videos(root: str, exts_noprefix: set, recursive: bool) -> Iterable[str]:
+    """Yields video file paths under root, matching extensions on the entry name."""
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                        continue
+                    name = entry.name
+                    dot = name.rfind(".")
+                    if dot > 0 and name[dot + 1 :].lower() in exts_noprefix:
+                        if entry.is_file():
+                            yield entry.path
+        except OSError:
+            continue
+
+
 def find_videos(paths: List[str], recursive: bool, exts: set) -> List[Path]:
-    vids: List[Path] = []
+    exts_noprefix = {e.lstrip(".").lower() for e in exts}
+    vids: List[str] = []
     for p in paths:
-        pp = Path(p)
-        if pp.is_dir():
-            if recursive:
-                for f in pp.rglob("*"):
-                    if f.is_file() and f.suffix.lower() in exts:
-                        vids.append(f)
-            else:
-                for f in pp.iterdir():
-                    if f.is_file() and f.suffix.lower() in exts:
-                        vids.append(f)
-        else:
-            if pp.is_file():
-                vids.append(pp)
+        if os.path.isdir(p):
+            vids.extend(_iter_videos(p, exts_noprefix, recursive))
+        elif os.path.isfile(p):
+            vids.append(p)
     seen = set()
     out = []
     for v in vids:
-        r = v.resolve()
+        r = os.path.normcase(os.path.abspath(v))
         if r not in seen:
             seen.add(r)
-            out.append(v)
+            out.append(Path(v))
     return out
 
 
+FFMPEG_LIMITS = [0.06, 0.08, 0.12, 0.18, 0.25, 0.35]
+ROW_KEYS = [
+    "file",
+    "width",
+    "height",
+    "duration_sec",
+    "crop",
+    "crop_w",
+    "crop_h",
+    "crop_x",
+    "crop_y",
+    "confidence",
+    "samples_seen",
+    "limits_agreed",
+    "notes",
+    "ffmpeg_apply",
+]
+
+
+def detect_crop(
+    vi: VideoInfo,
+    args: argparse.Namespace,
+    crop_mode: str,
+    manual_crop: Dict[str, int],
+    progress_mode: bool,
+    ffmpeg_workers: int = FFMPEG_WORKERS,
+) -> CropResult:
+    """Runs the configured detection for one video, falling back to full frame."""
+    res = None
+
+    if crop_mode == "manual":
+        mw = vi.width - manual_crop["left"] - manual_crop["right"]
+        mh = vi.height - manual_crop["top"] - manual_crop["bottom"]
+        if mw <= 0 or mh <= 0:
+            mw, mh = vi.width, vi.height
+        res = CropResult(
+            f"{mw}:{mh}:{manual_crop['left']}:{manual_crop['top']}",
+            mw,
+            mh,
+            manual_crop["left"],
+            manual_crop["top"],
+            1.0,
+            1,
+            [],
+            "Manual",
+        )
+        if progress_mode:
+            print("PROGRESS:100", flush=True)
+
+    elif args.aggressive:
+        # --- VapourSynth Mode ---
+        res = detect_vapoursynth(
+            vi,
+            mode=3,
+            value=15,
+            lum_thresh_int=1000,
+            progress_mode=progress_mode,
+        )
+
+    else:
+        # --- FFmpeg Mode ---
+        res = detect_ffmpeg(
+            vi,
+            args.samples,
+            args.segment,
+            args.fps,
+            FFMPEG_LIMITS,
+            args.round_to,
+            progress_mode,
+            ffmpeg_workers,
+        )
+
+    # Fallback
+    if not res:
+        res = CropResult(
+            f"{vi.width}:{vi.height}:0:0",
+            vi.width,
+            vi.height,
+            0,
+            0,
+            0.0,
+            0,
+            [],
+            "Failed/Full",
+        )
+    return res
+
+
+def build_row(vi: VideoInfo, res: CropResult) -> dict:
+    return {
+        "file": str(vi.path),
+        "width": vi.width,
+        "height": vi.height,
+        "duration_sec": round(vi.duration, 3),
+        "crop": res.crop,
+        "crop_w": res.w,
+        "crop_h": res.h,
+        "crop_x": res.x,
+        "crop_y": res.y,
+        "confidence": round(res.confidence, 4),
+        "samples_seen": res.samples,
+        "limits_agreed": ",".join(f"{x:.2f}" for x in res.chosen_from_limits),
+        "notes": res.notes,
+        "ffmpeg_apply": f'-vf "crop={res.crop}"',
+    }
+
+
 def main() -> int:
     # 1. Setup Temp Folder
     setup_temp_dir()
+    load_probe_cache()
+    atexit.register(save_probe_cache)
 
     # 2. Parse Args
     ap = argparse.ArgumentParser(
@@ -554,6 +986,13 @@ def main() -> int:
         action="store_true",
         help="Use VapourSynth+NumPy (Slower, precise)",
     )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Videos processed in parallel (default: half the CPU threads; "
+        "1 in --aggressive mode)",
+    )
     ap.add_argument("--out", default="crops.csv")
     ap.add_argument("--json-out", default="")
     ap.add_argument("--progress-mode", action="store_true", help=argparse.SUPPRESS)
@@ -582,127 +1021,102 @@ def main() -> int:
         print("No videos found.", file=sys.stderr)
         return 2
 
-    results_rows = []
-    json_results = []
+    # Probe all files up front; ffprobe runs are independent and mostly wait on I/O
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as ex:
+        infos = list(ex.map(ffprobe_info, videos))
 
-    for idx, vp in enumerate(videos, 1):
-        vi = ffprobe_info(vp)
-        if not vi:
-            continue
+    jobs = args.jobs
+    if jobs <= 0:
+        # VapourSynth already decodes on every core, so one video at a time
+        jobs = 1 if args.aggressive else FFMPEG_WORKERS
+    # Never more videos in flight than the ffmpeg cap allows
+    jobs = max(1, min(jobs, FFMPEG_WORKERS, sum(1 for vi in infos if vi)))
 
-        if not args.progress_mode:
-            print(f"[{idx}/{len(videos)}] {vp.name} ({vi.width}x{vi.height})")
-
-        res = None
-
-        if crop_mode == "manual":
-            mw = vi.width - manual_crop["left"] - manual_crop["right"]
-            mh = vi.height - manual_crop["top"] - manual_crop["bottom"]
-            if mw <= 0 or mh <= 0:
-                mw, mh = vi.width, vi.height
-            res = CropResult(
-                f"{mw}:{mh}:{manual_crop['left']}:{manual_crop['top']}",
-                mw,
-                mh,
-                manual_crop["left"],
-                manual_crop["top"],
-                1.0,
-                1,
-                [],
-                "Manual",
-            )
-            if args.progress_mode:
-                print("PROGRESS:100", flush=True)
-
-        elif args.aggressive:
-            # --- VapourSynth Mode ---
-            res = detect_vapoursynth(
-                vi,
-                mode=3,
-                value=15,
-                lum_thresh_int=1000,
-                progress_mode=args.progress_mode,
-            )
+    # Rows are written as soon as they are ready, in input order, so an
+    # interrupted batch still leaves every finished video on disk
+    order = [idx for idx, vi in enumerate(infos, 1) if vi]
+    pending: Dict[int, CropResult] = {}
+    written = 0
 
-        else:
-            # --- FFmpeg Mode ---
-            limits = [0.06, 0.08, 0.12, 0.18, 0.25, 0.35]
-            res = detect_ffmpeg(
-                vi,
-                args.samples,
-                args.segment,
-                args.fps,
-                limits,
-                args.round_to,
-                args.progress_mode,
-            )
-
-        # Fallback
-        if not res:
-            res = CropResult(
-                f"{vi.width}:{vi.height}:0:0",
-                vi.width,
-                vi.height,
-                0,
-                0,
-                0.0,
-                0,
-                [],
-                "Failed/Full",
-            )
-
-        row = {
-            "file": str(vp),
-            "width": vi.width,
-            "height": vi.height,
-            "duration_sec": round(vi.duration, 3),
-            "crop": res.crop,
-            "crop_w": res.w,
-            "crop_h": res.h,
-            "crop_x": res.x,
-            "crop_y": res.y,
-            "confidence": round(res.confidence, 4),
-            "samples_seen": res.samples,
-            "limits_agreed": ",".join(f"{x:.2f}" for x in res.chosen_from_limits),
-            "notes": res.notes,
-            "ffmpeg_apply": f'-vf "crop={res.crop}"',
-        }
-        results_rows.append(row)
-        json_results.append(row)
-
-        if not args.progress_mode:
-            print(f"  -> {res.crop} ({res.notes})")
-
-    # Output Writing
     out_csv = Path(args.out)
     out_csv.parent.mkdir(parents=True, exist_ok=True)
-    keys = [
-        "file",
-        "width",
-        "height",
-        "duration_sec",
-        "crop",
-        "crop_w",
-        "crop_h",
-        "crop_x",
-        "crop_y",
-        "confidence",
-        "samples_seen",
-        "limits_agreed",
-        "notes",
-        "ffmpeg_apply",
-    ]
+    csv_f = out_csv.open("w", newline="", encoding="utf-8")
+    csv_w = csv.writer(csv_f)
+    csv_w.writerow(ROW_KEYS)
+    json_f = open(args.json_out, "w", encoding="utf-8") if args.json_out else None
+    if json_f:
+        json_f.write("[")
+
+    def emit(idx: int, res: CropResult) -> None:
+        nonlocal written
+        pending[idx] = res
+        while written < len(order) and order[written] in pending:
+            i = order[written]
+            row = build_row(infos[i - 1], pending.pop(i))
+            csv_w.writerow([row[k] for k in ROW_KEYS])
+            if json_f:
+                item = json.dumps(row, indent=2).replace("\n", "\n  ")
+                json_f.write(("," if written else "") + "\n  " + item)
+            written += 1
+        csv_f.flush()
+        if json_f:
+            json_f.flush()
 
-    with out_csv.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=keys)
-        w.writeheader()
-        for r in results_rows:
-            w.writerow(r)
+    try:
+        if jobs == 1:
+            for idx, (vp, vi) in enumerate(zip(videos, infos), 1):
+                if not vi:
+                    continue
 
-    if args.json_out:
-        Path(args.json_out).write_text(
-            json.dumps(json_results, indent=2), encoding="utf-8"
-        )
+                if not args.progress_mode:
+                    print(f"[{idx}/{len(videos)}] {vp.name} ({vi.width}x{vi.height})")
+
+                res = detect_crop(vi, args, crop_mode, manual_crop, args.progress_mode)
+                emit(idx, res)
+
+                if not args.progress_mode:
+                    print(f"  -> {res.crop} ({res.notes})")
+        else:
+            # Each video runs in its own process; the per-video ffmpeg pool shrinks
+            # so the total number of ffmpeg children stays around FFMPEG_WORKERS
+            inner_workers = max(1, FFMPEG_WORKERS // jobs)
+            done = 0
+            with ProcessPoolExecutor(max_workers=jobs) as ex:
+                futures = {
+                    ex.submit(
+                        detect_crop,
+                        vi,
+                        args,
+                        crop_mode,
+                        manual_crop,
+                        False,
+                        inner_workers,
+                    ): idx
+                    for idx, vi in enumerate(infos, 1)
+                    if vi
+                }
+                for fut in as_completed(futures):
+                    idx = futures[fut]
+                    res = fut.result()
+                    emit(idx, res)
+                    done += 1
+
+                    if args.progress_mode:
+                        print(
+                            f"PROGRESS:{int((done / len(futures)) * 100)}", flush=True
+                        )
+                    else:
+                        vi = infos[idx - 1]
+                        print(
+                            f"[{idx}/{len(videos)}] {vi.path.name} "
+                            f"({vi.width}x{vi.height}) -> {res.crop} ({res.notes})"
+                        )
+    finally:
+        csv_f.close()
+        if json_f:
+            # Close the array even on Ctrl+C so the partial file still parses
+            json_f.write("\n]\n")
+            json_f.close()
 
     if not args.progress_mode:
         print(f"Done. Saved to {out_csv}")
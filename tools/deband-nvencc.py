@@ -9,6 +9,8 @@ import glob
 import subprocess
 import sys
 import shutil
+import queue
+import threading
 import configparser
 
 # --- Configuration & Paths ---
@@ -23,6 +25,21 @@ NVENCC_EXE = shutil.which("nvencc") or shutil.which("NVEncC")
 FFMPEG_EXE = shutil.which("ffmpeg")
 
 
+def env_max_procs():
+    """AB_MAX_PROCS if it is a positive integer, else half the CPU threads (min 2)."""
+    try:
+        value = int(os.environ.get("AB_MAX_PROCS", ""))
+    except ValueError:
+        value = 0
+    return value if value > 0 else max(2, (os.cpu_count() or 2) // 2)
+
+
+# Upper bound on concurrently running child processes (override with AB_MAX_PROCS).
+# The default never drops below 2 so an encode and the background mux overlap
+MAX_PROCS = env_max_procs()
+PROC_SEM = threading.BoundedSemaphore(MAX_PROCS)
+
+
 def load_settings():
     """Loads settings from settings.txt with fallback defaults."""
     config = configparser.ConfigParser()
@@ -49,6 +66,12 @@ def load_settings():
     return defaults
 
 
+def run_limited(cmd, **kwargs):
+    """subprocess.run that never has more than MAX_PROCS children running."""
+    with PROC_SEM:
+        return subprocess.run(cmd, **kwargs)
+
+
 def run_nvencc(input_file, output_h265, settings):
     """Runs NVEncC with fallback logic."""
 
@@ -74,7 +97,7 @@ def run_nvencc(input_file, output_h265, settings):
     print(f"\n[NVEncC] Processing: {input_file} (Attempt 1: With --avhw)")
     print("Command:", " ".join(cmd_primary))
 
-    result = subprocess.run(cmd_primary)
+    result = run_limited(cmd_primary)
 
     if result.returncode == 0:
         return True
@@ -82,7 +105,7 @@ def run_nvencc(input_file, output_h265, settings):
     # Fallback without --avhw
     print(f"\n[NVEncC] Attempt 1 failed. Retrying without --avhw...")
     print("Command:", " ".join(cmd_base))
-    result = subprocess.run(cmd_base)
+    result = run_limited(cmd_base)
 
     return result.returncode == 0
 
@@ -94,6 +117,9 @@ def run_ffmpeg_mux(video_file, audio_source, output_file):
     cmd = [
         FFMPEG_EXE,
         "-y",
+        "-nostats",
+        "-loglevel",
+        "warning",
         "-i",
         video_file,
         "-i",
@@ -109,14 +135,45 @@ def run_ffmpeg_mux(video_file, audio_source, output_file):
         output_file,
     ]
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    # Only stderr is kept, and it is small with -nostats/-loglevel warning
+    result = run_limited(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
 
     if result.returncode != 0:
-        print(f"[FFmpeg] Error: {result.stderr}")
+        print(f"[FFmpeg] Error: {result.stderr[-4096:]}")
         return False
     return True
 
 
+def mux_worker(jobs):
+    """Muxes finished encodes while the main thread encodes the next file."""
+    while True:
+        job = jobs.get()
+        try:
+            if job is None:
+                return
+            temp_h265, mkv, final_output = job
+            if run_ffmpeg_mux(temp_h265, mkv, final_output):
+                print(f"Done! Created: {final_output}")
+
+                try:
+                    if os.path.exists(temp_h265):
+                        os.remove(temp_h265)
+                    print("Temporary files cleaned up.")
+                except OSError as e:
+                    print(f"Warning: Could not clean up temp files: {e}")
+        except Exception as e:
+            # Keep draining the queue so main() never blocks on put()
+            print(f"[Mux] Error: {e}")
+        finally:
+            jobs.task_done()
+
+
 def main():
     if not NVENCC_EXE:
         print("Error: NVEncC not found in PATH.")
@@ -139,33 +196,35 @@ def main():
         print("No .mkv files found in the current folder.")
         return
 
-    for mkv in mkv_files:
-        if "-deband" in mkv:
-            continue
-
-        base_name = os.path.splitext(mkv)[0]
-        temp_h265 = f"{base_name}.h265"
-        final_output = f"{base_name}-deband.mkv"
-
-        print(f"==================================================")
-        print(f"Processing: {mkv}")
-        print(f"==================================================")
-
-        # 1. Run NVEncC
-        if not run_nvencc(mkv, temp_h265, settings):
-            print(f"Skipping {mkv} due to NVEncC errors.")
-            continue
-
-        # 2. Mux with FFmpeg
-        if run_ffmpeg_mux(temp_h265, mkv, final_output):
-            print(f"Done! Created: {final_output}")
-
-            try:
-                if os.path.exists(temp_h265):
-                    os.remove(temp_h265)
-                print("Temporary files cleaned up.")
-            except OSError as e:
-                print(f"Warning: Could not clean up temp files: {e}")
+    # Encoding uses the GPU one file at a time; muxing runs on a separate
+    # thread so it overlaps with the next encode
+    mux_queue = queue.Queue(maxsize=2)
+    muxer = threading.Thread(target=mux_worker, args=(mux_queue,))
+    muxer.start()
+
+    try:
+        for mkv in mkv_files:
+            if "-deband" in mkv:
+                continue
+
+            base_name = os.path.splitext(mkv)[0]
+            temp_h265 = f"{base_name}.h265"
+            final_output = f"{base_name}-deband.mkv"
+
+            print(f"==================================================")
+            print(f"Processing: {mkv}")
+            print(f"==================================================")
+
+            # 1. Run NVEncC
+            if not run_nvencc(mkv, temp_h265, settings):
+                print(f"Skipping {mkv} due to NVEncC errors.")
+                continue
+
+            # 2. Mux with FFmpeg (in the background)
+            mux_queue.put((temp_h265, mkv, final_output))
+    finally:
+        mux_queue.put(None)
+        muxer.join()
 
 
 if __name__ == "__main__":
@@ -5,10 +5,13 @@ Linux Port: Uses system FFmpeg and x265
 """
 
 import os
+import re
 import glob
 import subprocess
 import sys
 import shutil
+import queue
+import threading
 import configparser
 
 # --- Configuration & Paths ---
@@ -24,6 +27,21 @@ FFMPEG_EXE = shutil.which("ffmpeg")
 MEDIAINFO_EXE = shutil.which("mediainfo")
 
 
+def env_max_procs():
+    """AB_MAX_PROCS if it is a positive integer, else half the CPU threads (min 2)."""
+    try:
+        value = int(os.environ.get("AB_MAX_PROCS", ""))
+    except ValueError:
+        value = 0
+    return value if value > 0 else max(2, (os.cpu_count() or 2) // 2)
+
+
+# Upper bound on concurrently running child processes (override with AB_MAX_PROCS).
+# The default never drops below 2 so an encode and the background mux overlap
+MAX_PROCS = env_max_procs()
+PROC_SEM = threading.BoundedSemaphore(MAX_PROCS)
+
+
 def load_settings():
     """Loads settings from settings.txt with fallback defaults."""
     config = configparser.ConfigParser()
@@ -52,34 +70,32 @@ def load_settings():
     return defaults
 
 
+def run_limited(cmd, **kwargs):
+    """subprocess.run that never has more than MAX_PROCS children running."""
+    with PROC_SEM:
+        return subprocess.run(cmd, **kwargs)
+
+
+BT709_RE = re.compile(
+    r"^(Color primaries|Transfer characteristics|Matrix coefficients)"
+    r"\s*:\s*BT\.709\s*$",
+    re.M,
+)
+
+
 def check_bt709(input_file):
     """Check if file is BT.709 colorspace."""
     if not MEDIAINFO_EXE:
         return False
 
-    found_primaries = False
-    found_transfer = False
-    found_matrix = False
-
     try:
         cmd = [MEDIAINFO_EXE, input_file]
-        result = subprocess.run(
+        result = run_limited(
             cmd, capture_output=True, text=True, encoding="utf-8", errors="ignore"
         )
         if result.returncode == 0:
-            for line in result.stdout.splitlines():
-                if ":" not in line:
-                    continue
-                key, value = line.split(":", 1)
-                key, value = key.strip(), value.strip()
-                if key == "Color primaries" and value == "BT.709":
-                    found_primaries = True
-                elif key == "Transfer characteristics" and value == "BT.709":
-                    found_transfer = True
-                elif key == "Matrix coefficients" and value == "BT.709":
-                    found_matrix = True
-            if found_primaries and found_transfer and found_matrix:
-                return True
+            hits = {m.group(1) for m in BT709_RE.finditer(result.stdout)}
+            return len(hits) == 3
     except Exception as e:
         print(f"[Warning] MediaInfo execution failed: {e}")
     return False
@@ -139,12 +155,15 @@ def run_x265(vpy_file, output_hevc, is_bt709):
     print(f"\n[x265] Encoding: {vpy_file} -> {output_hevc}")
 
     try:
-        vspipe_proc = subprocess.Popen(
-            vspipe_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
-        )
-        x265_proc = subprocess.Popen(x265_cmd, stdin=vspipe_proc.stdout)
-        vspipe_proc.stdout.close()
-        x265_proc.wait()
+        # vspipe and x265 run as one pipeline, so they share a single slot
+        with PROC_SEM:
+            vspipe_proc = subprocess.Popen(
+                vspipe_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            x265_proc = subprocess.Popen(x265_cmd, stdin=vspipe_proc.stdout)
+            vspipe_proc.stdout.close()
+            x265_proc.wait()
+            vspipe_proc.wait()
         return x265_proc.returncode == 0
     except Exception as e:
         print(f"[x265] Error: {e}")
@@ -158,6 +177,9 @@ def run_ffmpeg_mux(video_file, audio_source, output_file):
     cmd = [
         FFMPEG_EXE,
         "-y",
+        "-nostats",
+        "-loglevel",
+        "warning",
         "-i",
         video_file,
         "-i",
@@ -173,14 +195,46 @@ def run_ffmpeg_mux(video_file, audio_source, output_file):
         output_file,
     ]
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    # Only stderr is kept, and it is small with -nostats/-loglevel warning
+    result = run_limited(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
 
     if result.returncode != 0:
-        print(f"[FFmpeg] Error: {result.stderr}")
+        print(f"[FFmpeg] Error: {result.stderr[-4096:]}")
         return False
     return True
 
 
+def mux_worker(jobs):
+    """Muxes finished encodes while the main thread encodes the next file."""
+    while True:
+        job = jobs.get()
+        try:
+            if job is None:
+                return
+            temp_hevc, mkv, final_output, temp_files = job
+            if run_ffmpeg_mux(temp_hevc, mkv, final_output):
+                print(f"Done! Created: {final_output}")
+
+                try:
+                    for f in temp_files:
+                        if os.path.exists(f):
+                            os.remove(f)
+                    print("Temporary files cleaned up.")
+                except OSError as e:
+                    print(f"Warning: Cleanup failed: {e}")
+        except Exception as e:
+            # Keep draining the queue so main() never blocks on put()
+            print(f"[Mux] Error: {e}")
+        finally:
+            jobs.task_done()
+
+
 def main():
     if not X265_EXE:
         print("Error: x265 not found in PATH.")
@@ -208,44 +262,45 @@ def main():
         print("No .mkv files found in the current folder.")
         return
 
-    for mkv in mkv_files:
-        if "-deband" in mkv:
-            continue
-
-        base_name = os.path.splitext(mkv)[0]
-        temp_vpy = f"{base_name}_temp.vpy"
-        temp_hevc = f"{base_name}.hevc"
-        final_output = f"{base_name}-deband.mkv"
-
-        print(f"==================================================")
-        print(f"Processing: {mkv}")
-        print(f"==================================================")
-
-        # 1. Detect BT.709
-        is_bt709 = check_bt709(mkv)
-
-        # 2. Generate VPY
-        print("[Script] Generating VapourSynth script...")
-        generate_vpy(mkv, temp_vpy, settings["vapoursynth_deband"])
-
-        # 3. Run x265
-        if not run_x265(temp_vpy, temp_hevc, is_bt709):
-            print(f"Error encoding {mkv}. Skipping.")
-            if os.path.exists(temp_vpy):
-                os.remove(temp_vpy)
-            continue
-
-        # 4. Mux Final
-        if run_ffmpeg_mux(temp_hevc, mkv, final_output):
-            print(f"Done! Created: {final_output}")
-
-            try:
-                for f in [temp_vpy, temp_hevc]:
-                    if os.path.exists(f):
-                        os.remove(f)
-                print("Temporary files cleaned up.")
-            except OSError as e:
-                print(f"Warning: Cleanup failed: {e}")
+    # x265 encodes one file at a time; muxing runs on a separate thread so
+    # it overlaps with the next encode
+    mux_queue = queue.Queue(maxsize=2)
+    muxer = threading.Thread(target=mux_worker, args=(mux_queue,))
+    muxer.start()
+
+    try:
+        for mkv in mkv_files:
+            if "-deband" in mkv:
+                continue
+
+            base_name = os.path.splitext(mkv)[0]
+            temp_vpy = f"{base_name}_temp.vpy"
+            temp_hevc = f"{base_name}.hevc"
+            final_output = f"{base_name}-deband.mkv"
+
+            print(f"==================================================")
+            print(f"Processing: {mkv}")
+            print(f"==================================================")
+
+            # 1. Detect BT.709
+            is_bt709 = check_bt709(mkv)
+
+            # 2. Generate VPY
+            print("[Script] Generating VapourSynth script...")
+            generate_vpy(mkv, temp_vpy, settings["vapoursynth_deband"])
+
+            # 3. Run x265
+            if not run_x265(temp_vpy, temp_hevc, is_bt709):
+                print(f"Error encoding {mkv}. Skipping.")
+                if os.path.exists(temp_vpy):
+                    os.remove(temp_vpy)
+                continue
+
+            # 4. Mux Final (in the background)
+            mux_queue.put((temp_hevc, mkv, final_output, [temp_vpy, temp_hevc]))
+    finally:
+        mux_queue.put(None)
+        muxer.join()
 
 
 if __name__ == "__main__":
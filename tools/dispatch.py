@@ -1,3 +1,4 @@
+import argparse
 import sys
 import subprocess
 import os
@@ -10,6 +11,95 @@ try:
 except ImportError:
     WAKEPY_AVAILABLE = False
 
+try:
+    from pymediainfo import MediaInfo
+
+    # The bindings are useless without libmediainfo itself
+    PYMEDIAINFO_AVAILABLE = MediaInfo.can_parse()
+except ImportError:
+    PYMEDIAINFO_AVAILABLE = False
+
+# MediaInfo text labels and the matching pymediainfo track attributes
+COLOR_FIELDS = {
+    "Color primaries": "color_primaries",
+    "Transfer characteristics": "transfer_characteristics",
+    "Matrix coefficients": "matrix_coefficients",
+}
+# Position of each label in the (primaries, transfer, matrix) flag lists
+COLOR_INDEX = {label: i for i, label in enumerate(COLOR_FIELDS)}
+# Options dispatch rewrites, by the spelling argparse knows them under
+REWRITTEN_OPTIONS = {
+    "-i": "--input",
+    "--input": "--input",
+    "--fast-params": "--fast-params",
+    "--final-params": "--final-params",
+}
+
+
+def join_option_values(args):
+    """
+    Rewrites "--opt value" as "--opt=value" for the options dispatch parses.
+    argparse rejects a separate value that starts with "-" (e.g. "--lp 3"),
+    and a trailing option with no value becomes an empty string.
+    """
+    joined = []
+    idx = 0
+    while idx < len(args):
+        option = REWRITTEN_OPTIONS.get(args[idx])
+        if option is None:
+            joined.append(args[idx])
+            idx += 1
+        else:
+            value = args[idx + 1] if idx + 1 < len(args) else ""
+            joined.append(f"{option}={value}")
+            idx += 2
+    return joined
+
+
+def read_color_fields(input_file, mediainfo_exe):
+    """Returns (label, value) colour pairs from MediaInfo, or None on error."""
+    if PYMEDIAINFO_AVAILABLE:
+        # In-process library call, no mediainfo process or text to parse
+        tracks = MediaInfo.parse(input_file).video_tracks
+        if not tracks:
+            return []
+        fields = []
+        for key, attr in COLOR_FIELDS.items():
+            value = getattr(tracks[0], attr, None)
+            if value:
+                fields.append((key, str(value).strip()))
+        return fields
+
+    cmd = [mediainfo_exe, input_file]
+    fields = []
+    seen = set()
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="ignore",
+    ) as proc:
+        # Parse the text output line by line as it streams in
+        for line in proc.stdout:
+            # Split into Key : Value; labels start at column 0
+            key, sep, value = line.partition(":")
+            if not sep:
+                continue
+            key = key.rstrip()
+            if key in COLOR_FIELDS:
+                fields.append((key, value.strip()))
+                seen.add(key)
+                if len(seen) == len(COLOR_FIELDS):
+                    # All three tags of the first video track are in
+                    proc.terminate()
+                    return fields
+
+    if proc.returncode != 0:
+        return None
+    return fields
+
 
 def main():
     # --- Configuration ---
@@ -25,84 +115,49 @@ def main():
     mediainfo_exe = shutil.which("mediainfo")
 
     # --- Argument Parsing ---
-    # Find input file (-i or --input)
+    # Pull out the options dispatch rewrites; everything else passes through
+    # untouched. No abbreviations, so e.g. "--fast" can't match --fast-params
     args = sys.argv[1:]
-    input_file = None
-
-    for idx, arg in enumerate(args):
-        if arg in ("-i", "--input") and idx + 1 < len(args):
-            input_file = args[idx + 1]
-            break
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("-i", "--input")
+    parser.add_argument("--fast-params")
+    parser.add_argument("--final-params")
+    known, rest = parser.parse_known_args(join_option_values(args))
+    input_file = known.input
 
     # --- Color Space Detection via MediaInfo ---
     is_bt709 = False
     is_bt601 = False
 
-    # Flags to track BT.709
-    f_prim_709 = False
-    f_trans_709 = False
-    f_mat_709 = False
-
-    # Flags to track BT.601
-    f_prim_601 = False
-    f_trans_601 = False
-    f_mat_601 = False
+    # Flags to track BT.709 / BT.601 as (primaries, transfer, matrix)
+    flags_709 = [False, False, False]
+    flags_601 = [False, False, False]
 
     if input_file and os.path.exists(input_file):
-        if mediainfo_exe:
+        if PYMEDIAINFO_AVAILABLE or mediainfo_exe:
             try:
-                # Run MediaInfo on the file
-                cmd = [mediainfo_exe, input_file]
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    encoding="utf-8",
-                    errors="ignore",
-                )
-
-                if result.returncode == 0:
-                    # Parse the text output line by line
-                    for line in result.stdout.splitlines():
-                        if ":" not in line:
-                            continue
-
-                        # Split into Key : Value
-                        key, value = line.split(":", 1)
-                        key = key.strip()
-                        value = value.strip()
-
-                        # Check Color Primaries
-                        if key == "Color primaries":
-                            if value == "BT.709":
-                                f_prim_709 = True
-                            elif "BT.601" in value:
-                                f_prim_601 = True
-
-                        # Check Transfer characteristics
-                        elif key == "Transfer characteristics":
-                            if value == "BT.709":
-                                f_trans_709 = True
-                            elif "BT.601" in value:
-                                f_trans_601 = True
-
-                        # Check Matrix coefficients
-                        elif key == "Matrix coefficients":
-                            if value == "BT.709":
-                                f_mat_709 = True
-                            elif "BT.601" in value:
-                                f_mat_601 = True
+                fields = read_color_fields(input_file, mediainfo_exe)
+
+                if fields is not None:
+                    for key, value in fields:
+                        i = COLOR_INDEX[key]
+                        if value == "BT.709":
+                            flags_709[i] = True
+                        elif "BT.601" in value:
+                            flags_601[i] = True
 
                     # Evaluate Detection
-                    if f_prim_709 and f_trans_709 and f_mat_709:
+                    if all(flags_709):
                         is_bt709 = True
                         print("[Dispatch] MediaInfo confirmed full BT.709 source.")
-                    elif f_prim_601 and f_trans_601 and f_mat_601:
+                    elif all(flags_601):
                         is_bt601 = True
                         print("[Dispatch] MediaInfo confirmed full BT.601 source.")
                     else:
+                        r709 = ",".join(map(str, flags_709))
+                        r601 = ",".join(map(str, flags_601))
                         print(
-                            f"[Dispatch] MediaInfo results - 709: ({f_prim_709},{f_trans_709},{f_mat_709}) | 601: ({f_prim_601},{f_trans_601},{f_mat_601}). No standard color match."
+                            f"[Dispatch] MediaInfo results - 709: ({r709}) | 601: ({r601}). No standard color match."
                         )
                 else:
                     print("[Dispatch] Warning: MediaInfo returned an error.")
@@ -145,26 +200,16 @@ def main():
     else:
         print("[Dispatch] Using standard parameters (no color injection).")
 
-    skip_next = False
-    for idx, arg in enumerate(args):
-        if skip_next:
-            skip_next = False
-            continue
-
-        # If we find the parameter strings, append flags if needed
-        if arg in ("--fast-params", "--final-params"):
-            final_cmd.append(arg)
-            if idx + 1 < len(args):
-                param_str = args[idx + 1]
-                # Append detected flags to the existing string
-                if current_flags:
-                    param_str += current_flags
-                final_cmd.append(param_str)
-                skip_next = True
-            else:
-                final_cmd.append("")
-        else:
-            final_cmd.append(arg)
+    if input_file is not None:
+        final_cmd.extend(["-i", input_file])
+    # Append detected flags to the parameter strings that were given
+    for flag, param_str in (
+        ("--fast-params", known.fast_params),
+        ("--final-params", known.final_params),
+    ):
+        if param_str is not None:
+            final_cmd.extend([flag, param_str + current_flags])
+    final_cmd.extend(rest)
 
     # --- Execute ---
     try:
@@ -1,5 +1,5 @@
 import os
-import glob
+import re
 import subprocess
 import shutil
 
@@ -19,6 +19,9 @@ if not X265_EXE:
     )
     sys.exit(1)
 
+# FFmpeg decodes the source and pipes it to x265 as Y4M
+FFMPEG_EXE = shutil.which("ffmpeg") or "ffmpeg"
+
 X265_SETTINGS = [
     "--preset",
     "superfast",
@@ -35,19 +38,22 @@ X265_SETTINGS = [
     "0",
 ]
 
+# Filename sanitizing: drop brackets/braces, spaces become periods
+SANITIZE_TABLE = str.maketrans(" ", ".", "()[]{}")
+DOTS_RE = re.compile(r"\.{2,}")
 
-def run_shell_command(cmd_list):
-    """Executes a command list via subprocess."""
-    # Convert list to string for display/debugging
-    cmd_str = " ".join([f'"{c}"' if " " in c else c for c in cmd_list])
-    print(f"Running: {cmd_str}")
 
-    try:
-        subprocess.run(cmd_list, check=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Command failed: {e}")
-        return False
+def scan_mkv_files():
+    """
+    Returns the names of the .mkv files in the current directory from a
+    single directory read (hidden files skipped, like glob).
+    """
+    with os.scandir(".") as it:
+        return {
+            e.name
+            for e in it
+            if e.name.endswith(".mkv") and not e.name.startswith(".") and e.is_file()
+        }
 
 
 def sanitize_filenames():
@@ -60,26 +66,16 @@ def sanitize_filenames():
     # Files to ignore (outputs or scripts)
     exclusions = ("-x265lossless", ".vpy", ".py", ".bat")
 
-    mkv_files = glob.glob("*.mkv")
-
-    for filename in mkv_files:
+    for filename in scan_mkv_files():
         base, ext = os.path.splitext(filename)
 
         # Skip files that are likely already outputs
         if base.endswith("-x265lossless"):
             continue
 
-        new_base = base
-        # Remove brackets/braces
-        for char in ["(", ")", "[", "]", "{", "}"]:
-            new_base = new_base.replace(char, "")
-
-        # Replace spaces with periods
-        new_base = new_base.replace(" ", ".")
-
-        # Clean up double dots potentially created by replacements
-        while ".." in new_base:
-            new_base = new_base.replace("..", ".")
+        # Remove brackets/braces and replace spaces with periods, then clean
+        # up runs of dots potentially created by the replacements
+        new_base = DOTS_RE.sub(".", base.translate(SANITIZE_TABLE))
 
         new_filename = new_base + ext
 
@@ -93,89 +89,101 @@ def sanitize_filenames():
     print("------------------------------------------\n")
 
 
-def create_vpy_script(source_file, vpy_filename):
+def run_encode_pipeline(source_file, output_file):
     """
-    Generates a simple VapourSynth script that:
-    1. Loads video using ffms2.
-    2. Converts to 10-bit (YUV420P10).
+    Pipes the source through FFmpeg into x265 as 10-bit Y4M.
+    Every decoded frame is passed through exactly once (no CFR duplication
+    or dropping), so the intermediary keeps the source's frame count.
+    The 8-bit to 10-bit widening is done by swscale and is not guaranteed
+    to be bit-identical to the old VapourSynth Point resize.
     """
-    # Use absolute path for source to avoid ambiguity in VapourSynth
-    abs_source = os.path.abspath(source_file).replace("\\", "/")
-
-    vpy_content = f"""
-import vapoursynth as vs
-core = vs.core
-
-# Load source
-clip = core.ffms2.Source(source=r"{abs_source}")
+    ffmpeg_cmd = [
+        FFMPEG_EXE,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        source_file,
+        "-map",
+        "0:v:0",
+        "-pix_fmt",
+        "yuv420p10le",
+        "-strict",
+        "-1",
+        # Y4M output would otherwise be forced to CFR. -vsync rather than
+        # -fps_mode so distro FFmpeg 4.x builds still accept it
+        "-vsync",
+        "passthrough",
+        "-f",
+        "yuv4mpegpipe",
+        "-",
+    ]
+    x265_cmd = [X265_EXE] + X265_SETTINGS + ["--y4m", "-o", output_file, "-"]
 
-# Convert to 10-bit using Point resize (clean bit-depth padding)
-clip = clip.resize.Point(format=vs.YUV420P10)
+    # Convert list to string for display/debugging
+    cmd_list = ffmpeg_cmd + ["|"] + x265_cmd
+    cmd_str = " ".join([f'"{c}"' if " " in c else c for c in cmd_list])
+    print(f"Running: {cmd_str}")
 
-clip.set_output()
-"""
     try:
-        with open(vpy_filename, "w", encoding="utf-8") as f:
-            f.write(vpy_content)
-        return True
-    except IOError as e:
-        print(f"[ERROR] Failed to write VPY script: {e}")
+        ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE)
+        x265_proc = subprocess.Popen(x265_cmd, stdin=ffmpeg_proc.stdout)
+        # Only x265 holds the read end now, so FFmpeg sees EPIPE if x265 dies
+        ffmpeg_proc.stdout.close()
+        x265_proc.wait()
+        ffmpeg_proc.wait()
+    except OSError as e:
+        print(f"[ERROR] Command failed: {e}")
         return False
 
+    if ffmpeg_proc.returncode != 0 or x265_proc.returncode != 0:
+        print(
+            f"[ERROR] Command failed: ffmpeg exited {ffmpeg_proc.returncode}, "
+            f"x265 exited {x265_proc.returncode}"
+        )
+        return False
+    return True
+
 
 def main():
     # 1. Sanitize filenames in current folder (extras)
     sanitize_filenames()
 
-    # 2. Find all MKV files
-    source_files = glob.glob("*.mkv")
+    # 2. Find all MKV files; output existence is checked against this listing
+    source_files = scan_mkv_files()
 
     if not source_files:
         print("No .mkv files found in the current folder.")
         return
 
-    for source_file in source_files:
+    for source_file in sorted(source_files):
         # Skip existing output files to prevent loops
         if "-x265lossless" in source_file:
             continue
 
         base_name, ext = os.path.splitext(source_file)
         output_file = f"{base_name}-x265lossless.mkv"
-        vpy_file = f"{base_name}.vpy"
 
         # Check if output already exists
-        if os.path.exists(output_file):
+        if output_file in source_files:
             print(f"Skipping: {source_file}")
             print(f"Reason: Output '{output_file}' already exists.\n")
             continue
 
         print(f"\n=== Processing: {source_file} ===")
 
-        # A. Create VapourSynth script
-        if not create_vpy_script(source_file, vpy_file):
-            continue
-
-        # B. Construct x265 Command
-        # Format: x265 [settings] -o output.mkv input.vpy
-        cmd = [X265_EXE] + X265_SETTINGS + ["-o", output_file, vpy_file]
-
-        # C. Run Encode
-        success = run_shell_command(cmd)
-
-        # D. Cleanup
-        if os.path.exists(vpy_file):
-            try:
-                os.remove(vpy_file)
-            except OSError:
-                pass
+        # Decode with FFmpeg and encode with x265 in one pipeline
+        success = run_encode_pipeline(source_file, output_file)
 
         if success:
             print(f"Success! Created: {output_file}")
         else:
             print(f"Failed to encode: {source_file}")
             # Optional: Delete partial output if failed
-            if os.path.exists(output_file):
+            try:
                 os.remove(output_file)
+            except FileNotFoundError:
+                pass
 
 
 if __name__ == "__main__":
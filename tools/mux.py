@@ -7,42 +7,77 @@ Includes VFR (Variable Frame Rate) support.
 
 import os
 import subprocess
-import glob
 import sys
 import json
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 # Tool paths (use system binaries)
 MKVMERGE = shutil.which("mkvmerge") or "mkvmerge"
 MKVEXTRACT = shutil.which("mkvextract") or "mkvextract"
 MKVPROPEDIT = shutil.which("mkvpropedit") or "mkvpropedit"
 MEDIAINFO = shutil.which("mediainfo") or "mediainfo"
+# Resolved once above; a bare name means the tool was not found on PATH
+HAVE_MKVPROPEDIT = MKVPROPEDIT != "mkvpropedit"
+HAVE_MEDIAINFO = MEDIAINFO != "mediainfo"
+
+
+def env_max_procs():
+    """AB_MAX_PROCS if it is a positive integer, else half the CPU threads (min 2)."""
+    try:
+        value = int(os.environ.get("AB_MAX_PROCS", ""))
+    except ValueError:
+        value = 0
+    return value if value > 0 else max(2, (os.cpu_count() or 2) // 2)
+
+
+# Files muxed at once; mkvmerge is mostly disk-bound, so keep it small
+MUX_WORKERS = min(4, env_max_procs())
+# Live "\r" progress lines only make sense on a terminal while one file is
+# muxing; redirected logs just get the "Done." lines
+IS_TTY = sys.stdout.isatty()
+LIVE_PROGRESS = IS_TTY
+
+# Parsed `mkvmerge -J` output by real path: (mtime_ns, size, data)
+_mkvj_cache = {}
 
 
 def run_command(cmd, status_label):
     """
     Runs a command hidden, parsing output to update a single progress line.
     """
-    process = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
-    )
-
-    print(f"{status_label}: Starting...          ", end="\r")
-    sys.stdout.flush()
+    if not LIVE_PROGRESS:
+        # Nobody sees the progress lines, so don't pipe them at all
+        process = subprocess.run(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    else:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
 
-    for line in process.stdout:
-        line = line.strip()
-        if line.startswith("Progress:"):
-            percent = line.split(":")[-1].strip()
+        print(f"{status_label}: Starting...          ", end="\r")
+        sys.stdout.flush()
+
+        # Text mode already splits on "\r" as well as "\n"; only redraw the
+        # progress line when the percentage actually changes
+        last_percent = None
+        for line in process.stdout:
+            if not line.startswith("Progress:"):
+                continue
+            percent = line.partition(":")[2].strip()
+            if percent == last_percent:
+                continue
+            last_percent = percent
             print(f"{status_label}: {percent}          ", end="\r")
             sys.stdout.flush()
 
-    process.wait()
+        process.wait()
 
     if process.returncode != 0:
         print(f"\n[ERROR] Command failed: {' '.join(cmd)}")
@@ -51,45 +86,72 @@ def run_command(cmd, status_label):
     print(f"{status_label}: Done.          ")
 
 
-def force_vfr_metadata(file_path, status_label):
+def force_vfr_metadata(file_path, status_label, video_track_count=None):
     """
     Uses mkvpropedit to remove the 'DefaultDuration' element from video tracks.
     Removing DefaultDuration prevents tools like MediaInfo from treating the
-    stream as CFR purely from metadata.
+    stream as CFR purely from metadata. Pass video_track_count when it is
+    already known to skip identifying the file again.
     """
-    if not shutil.which("mkvpropedit"):
+    if not HAVE_MKVPROPEDIT:
         print("[WARN] mkvpropedit not found. Skipping metadata edit.")
         return
 
-    video_track_count = get_video_track_count(file_path) or 1
+    if video_track_count is None:
+        video_track_count = get_video_track_count(file_path)
+    video_track_count = video_track_count or 1
 
-    cmd = [MKVPROPEDIT, "--parse-mode", "full", file_path]
+    # The file was just written by mkvmerge, so its SeekHead points at the
+    # track headers; the default fast parse mode avoids reading the whole file
+    cmd = [MKVPROPEDIT, file_path]
     for i in range(1, video_track_count + 1):
         cmd.extend(["--edit", f"track:v{i}", "--delete", "default-duration"])
 
-    print(f"{status_label}: Updating...          ", end="\r")
-    sys.stdout.flush()
+    if LIVE_PROGRESS:
+        print(f"{status_label}: Updating...          ", end="\r")
+        sys.stdout.flush()
 
     try:
         subprocess.run(
             cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
         )
+        # The file changed in place; its identification is stale now
+        _mkvj_cache.pop(os.path.realpath(file_path), None)
         print(f"{status_label}: Done.          ")
     except subprocess.CalledProcessError as e:
         print(f"[WARN] Failed to edit properties: {e}")
 
 
+def _mkv_identify(path):
+    """
+    Returns the parsed `mkvmerge -J` identification for a file, running
+    mkvmerge only once per unchanged file. Raises on mkvmerge failure.
+    """
+    key = os.path.realpath(path)
+    st = os.stat(key)
+    cached = _mkvj_cache.get(key)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+
+    result = subprocess.run(
+        [MKVMERGE, "-J", path],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        check=True,
+    )
+    data = json.loads(result.stdout)
+    _mkvj_cache[key] = (st.st_mtime_ns, st.st_size, data)
+    return data
+
+
 def get_video_track_id(source_file):
     """
     Uses mkvmerge to find the ID of the video track for extraction.
     Returns: track_id (int) or None if not found.
     """
-    cmd = [MKVMERGE, "-J", source_file]
     try:
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, encoding="utf-8", check=True
-        )
-        data = json.loads(result.stdout)
+        data = _mkv_identify(source_file)
 
         for track in data.get("tracks", []):
             if track.get("type") == "video":
@@ -104,12 +166,8 @@ def get_video_track_count(source_file):
     """
     Uses mkvmerge JSON output to count the number of video tracks in a file.
     """
-    cmd = [MKVMERGE, "-J", source_file]
     try:
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, encoding="utf-8", check=True
-        )
-        data = json.loads(result.stdout)
+        data = _mkv_identify(source_file)
         count = 0
         for track in data.get("tracks", []):
             if track.get("type") == "video":
@@ -123,19 +181,29 @@ def check_vfr_mediainfo(source_file):
     """
     Uses MediaInfo to check if the video has a Variable frame rate mode.
     """
-    if not shutil.which("mediainfo"):
+    if not HAVE_MEDIAINFO:
         return False
 
     cmd = [MEDIAINFO, source_file]
     try:
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, encoding="utf-8", check=True
-        )
-
-        # Parse output for "Frame rate mode : Variable"
-        for line in result.stdout.splitlines():
-            if "frame rate mode" in line.lower() and "variable" in line.lower():
-                return True
+        # Stream the report and stop MediaInfo as soon as the answer is known
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        ) as proc:
+            # Parse output for "Frame rate mode : Variable"
+            for line in proc.stdout:
+                lower = line.lower()
+                if "frame rate mode" in lower and "variable" in lower:
+                    proc.terminate()
+                    return True
+
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
 
     except Exception as e:
         print(f"[WARN] MediaInfo check failed: {e}")
@@ -143,125 +211,177 @@ def check_vfr_mediainfo(source_file):
     return False
 
 
-def mux_files():
-    # Determine input/output directories
-    output_dir = "Output"
-    input_dir = "Input"
-
-    # Fallback to current dir if no Output folder found
-    if not os.path.exists(output_dir):
-        output_dir = "."
-        input_dir = "."
+def list_names(path):
+    """
+    Returns the entry names of a directory from a single read, so existence
+    checks become set lookups instead of one stat() each.
+    """
+    try:
+        with os.scandir(path) as it:
+            return {e.name for e in it}
+    except OSError:
+        return set()
+
+
+def find_source(base_name, input_dir, input_names):
+    """Returns the source MKV matching an encode, or None."""
+    # Check for matching source file in Input folder
+    possible_sources = [f"{base_name}.mkv", f"{base_name}-source.mkv"]
+    for name in possible_sources:
+        if name in input_names:
+            return os.path.join(input_dir, name)
+    return None
 
-    av1_files = glob.glob(os.path.join(output_dir, "*-av1.mkv"))
 
-    if not av1_files:
-        print("No *-av1.mkv files found to mux.")
-        return
+def output_up_to_date(av1_file, final_output):
+    """True when final_output exists and is newer than its AV1 input."""
+    try:
+        return os.stat(final_output).st_mtime > os.stat(av1_file).st_mtime
+    except OSError:
+        return False
 
-    print(f"Found {len(av1_files)} '-av1.mkv' files. Starting muxing process...\n")
 
-    for av1_file in av1_files:
-        filename = os.path.basename(av1_file)
-        base_name = filename.replace("-av1.mkv", "")
+def mux_one(av1_file, input_dir, input_names, output_dir):
+    """Muxes one *-av1.mkv with the audio/subs of its source."""
+    filename = os.path.basename(av1_file)
+    base_name = filename.replace("-av1.mkv", "")
 
-        # Check for matching source file in Input folder
-        possible_sources = [
-            os.path.join(input_dir, f"{base_name}.mkv"),
-            os.path.join(input_dir, f"{base_name}-source.mkv"),
-        ]
-        source_mkv = None
-        for path in possible_sources:
-            if os.path.exists(path):
-                source_mkv = path
-                break
+    source_mkv = find_source(base_name, input_dir, input_names)
+    if not source_mkv:
+        print(f"[SKIP] Source file not found for: {filename}")
+        return
 
-        if not source_mkv:
-            print(f"[SKIP] Source file not found for: {filename}")
-            continue
+    final_output = os.path.join(output_dir, f"{base_name}-output.mkv")
+    # Written under a temporary name so an interrupted run never leaves a
+    # partial file that looks up-to-date
+    part_output = os.path.join(output_dir, f"{base_name}-output.part.mkv")
+    timestamp_file = os.path.join(output_dir, f"{base_name}_timestamps.txt")
 
-        temp_mkv = os.path.join(output_dir, f"{base_name}_temp_no_video.mkv")
-        final_output = os.path.join(output_dir, f"{base_name}-output.mkv")
-        timestamp_file = os.path.join(output_dir, f"{base_name}_timestamps.txt")
+    # Re-runs skip outputs that are newer than their AV1 input
+    if output_up_to_date(av1_file, final_output):
+        print(f"[SKIP] {final_output} up-to-date")
+        return
 
-        try:
-            # Step 0: Detect VFR using MediaInfo
-            is_vfr = check_vfr_mediainfo(source_mkv)
-            timestamps_args = []
-
-            # Steps: 1.ExtractAudio -> 2.Merge -> 3.Metadata(PropEdit)
-            # If VFR: + ExtractTimestamps = 4 Total
-            total_steps = 4 if is_vfr else 2
-            current_step = 1
-
-            if is_vfr:
-                # Green text for detection
-                print(
-                    "\033[92mVariable framerate detected, applying timecodes...\033[0m"
-                )
-
-                # Get track ID (usually 0, but safest to ask mkvmerge)
-                vid_track_id = get_video_track_id(source_mkv) or 0
-
-                # Extract timestamps from the SOURCE video track
-                cmd_extract_ts = [
-                    MKVEXTRACT,
-                    source_mkv,
-                    "timestamps_v2",
-                    f"{vid_track_id}:{timestamp_file}",
-                ]
-                run_command(
-                    cmd_extract_ts,
-                    f"[{base_name}] Step {current_step}/{total_steps} (Timecodes)",
-                )
-                current_step += 1
-
-                # Prepare args for the final mux
-                if os.path.exists(timestamp_file):
-                    av1_track_id = get_video_track_id(av1_file) or 0
-                    timestamps_args = [
-                        "--timestamps",
-                        f"{av1_track_id}:{timestamp_file}",
-                    ]
-
-            # Step 1 (or 2): Extract Audio/Subs (No Video) from source
-            cmd_step1 = [MKVMERGE, "-o", temp_mkv, "--no-video", source_mkv]
+    try:
+        # Step 0: Detect VFR using MediaInfo
+        is_vfr = check_vfr_mediainfo(source_mkv)
+        timestamps_args = []
+
+        # Steps: 1.Merge
+        # If VFR: ExtractTimestamps -> Merge -> Metadata(PropEdit) = 3 Total
+        total_steps = 3 if is_vfr else 1
+        current_step = 1
+
+        if is_vfr:
+            # Green text for detection
+            print("\033[92mVariable framerate detected, applying timecodes...\033[0m")
+
+            # Get track ID (usually 0, but safest to ask mkvmerge)
+            vid_track_id = get_video_track_id(source_mkv) or 0
+
+            # Extract timestamps from the SOURCE video track
+            cmd_extract_ts = [
+                MKVEXTRACT,
+                source_mkv,
+                "timestamps_v2",
+                f"{vid_track_id}:{timestamp_file}",
+            ]
             run_command(
-                cmd_step1,
-                f"[{base_name}] Step {current_step}/{total_steps} (Extract)",
+                cmd_extract_ts,
+                f"[{base_name}] Step {current_step}/{total_steps} (Timecodes)",
             )
             current_step += 1
 
-            # Step 2 (or 3): Mux AV1 + Audio/Subs + (Optional) Timestamps
-            cmd_step2 = [MKVMERGE, "-o", final_output]
+            # Prepare args for the final mux
+            if os.path.exists(timestamp_file):
+                av1_track_id = get_video_track_id(av1_file) or 0
+                timestamps_args = [
+                    "--timestamps",
+                    f"{av1_track_id}:{timestamp_file}",
+                ]
+
+        # Step 1 (or 2): Mux AV1 + Audio/Subs from source + (Optional) Timestamps
+        # Reading the source directly avoids an audio/subs copy on disk
+        cmd_merge = [MKVMERGE, "-o", part_output]
 
-            # Timestamps args MUST come BEFORE the AV1 input file
-            cmd_step2.extend(timestamps_args)
-            cmd_step2.append(av1_file)
+        # Timestamps args MUST come BEFORE the AV1 input file
+        cmd_merge.extend(timestamps_args)
+        cmd_merge.append(av1_file)
 
-            # Add Audio/Subs source
-            cmd_step2.append(temp_mkv)
+        # --no-video applies to the source file that follows it
+        cmd_merge.extend(["--no-video", source_mkv])
 
-            run_command(
-                cmd_step2, f"[{base_name}] Step {current_step}/{total_steps} (Merge)  "
+        run_command(
+            cmd_merge,
+            f"[{base_name}] Step {current_step}/{total_steps} (Merge)  ",
+        )
+        current_step += 1
+
+        # Step 3: Force Variable Frame Rate Mode (Metadata)
+        if is_vfr:
+            # The output's only video tracks are the AV1 file's, whose
+            # identification is usually cached from the timestamps step
+            force_vfr_metadata(
+                part_output,
+                f"[{base_name}] Step {current_step}/{total_steps} (VFR Fix)",
+                get_video_track_count(av1_file),
             )
-            current_step += 1
 
-            # Step 3 (or 4): Force Variable Frame Rate Mode (Metadata)
-            if is_vfr:
-                force_vfr_metadata(
-                    final_output,
-                    f"[{base_name}] Step {current_step}/{total_steps} (VFR Fix)",
-                )
+        os.replace(part_output, final_output)
 
-            # Cleanup
-            if os.path.exists(temp_mkv):
-                os.remove(temp_mkv)
-            if os.path.exists(timestamp_file):
-                os.remove(timestamp_file)
+        # Cleanup
+        try:
+            os.remove(timestamp_file)
+        except FileNotFoundError:
+            pass
+
+    except subprocess.CalledProcessError:
+        print(f"\n[FAIL] Could not process {base_name}. Skipping.")
+    finally:
+        # Only still there if the run failed before os.replace
+        try:
+            os.remove(part_output)
+        except FileNotFoundError:
+            pass
 
-        except subprocess.CalledProcessError:
-            print(f"\n[FAIL] Could not process {base_name}. Skipping.")
+
+def mux_files():
+    global LIVE_PROGRESS
+
+    # Determine input/output directories
+    output_dir = "Output"
+    input_dir = "Input"
+
+    # Fallback to current dir if no Output folder found
+    if not os.path.exists(output_dir):
+        output_dir = "."
+        input_dir = "."
+
+    output_names = list_names(output_dir)
+    input_names = output_names if input_dir == output_dir else list_names(input_dir)
+    av1_files = [
+        os.path.join(output_dir, name)
+        for name in sorted(output_names)
+        if name.endswith("-av1.mkv") and not name.startswith(".")
+    ]
+
+    if not av1_files:
+        print("No *-av1.mkv files found to mux.")
+        return
+
+    print(f"Found {len(av1_files)} '-av1.mkv' files. Starting muxing process...\n")
+
+    workers = min(MUX_WORKERS, len(av1_files))
+    LIVE_PROGRESS = IS_TTY and workers == 1
+
+    # Files are independent, so several can mux at once
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(mux_one, av1_file, input_dir, input_names, output_dir)
+            for av1_file in av1_files
+        ]
+        for fut in futures:
+            fut.result()
 
 
 if __name__ == "__main__":
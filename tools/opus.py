@@ -8,13 +8,22 @@ import json
 import re
 import shutil
 import platform
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import psutil
 
 # ================= CONFIGURATION =================
-# Detect CPU threads and leave 1 free for system responsiveness
-TOTAL_THREADS = psutil.cpu_count(logical=True)
-PARALLELISM = max(1, (TOTAL_THREADS if TOTAL_THREADS else 2) - 1)
+# Detect the CPU threads this process may run on (honours taskset/cpuset
+# affinity) and leave 1 free for system responsiveness
+try:
+    TOTAL_THREADS = len(os.sched_getaffinity(0))
+except AttributeError:
+    TOTAL_THREADS = os.cpu_count() or 2
+PARALLELISM = max(1, TOTAL_THREADS - 1)
+# Concurrency lives in the worker slots; one thread per ffmpeg keeps
+# PARALLELISM encodes from oversubscribing the cores
+FFMPEG_THREADS_PER_WORKER = 1
+# mkvmerge is mostly disk-bound, so only a few muxes run at once
+MUX_WORKERS = min(4, PARALLELISM)
 
 LOSSLESS_EXTS = {".flac", ".wav", ".thd", ".dtshd", ".pcm"}
 
@@ -23,11 +32,15 @@ IGNORE_EXTS = set()
 
 # Global Queues and Locks
 slot_status = ["Idle"] * PARALLELISM
-files_queue = queue.Queue()
+free_slots = queue.Queue()
+for _slot in range(PARALLELISM):
+    free_slots.put(_slot)
 stop_display = threading.Event()
 
 # Regex for FFMPEG progress parsing
 re_ffmpeg = re.compile(r"time=\s*(\S+).*bitrate=\s*(\S+).*speed=\s*(\S+)")
+re_percent = re.compile(r"(\d+)%")
+re_opus_track = re.compile(r".*_track(\d+)_([a-zA-Z0-9]+)\.opus$")
 
 # --- PATH SETUP (Cross-Platform) ---
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -212,9 +225,12 @@ def extract_tracks(mode):
         f"Found {len(mkvs)} MKV files. Analyzing tracks with {PARALLELISM} workers..."
     )
     extracted_files = []
+    extract_jobs = []
 
-    for mkv in mkvs:
-        tracks = get_mkv_tracks(mkv)
+    with ThreadPoolExecutor(max_workers=PARALLELISM) as ex:
+        all_tracks = list(ex.map(get_mkv_tracks, mkvs))
+
+    for mkv, tracks in zip(mkvs, all_tracks):
         extract_cmds = []
 
         # Create a temp folder for this video
@@ -270,11 +286,15 @@ def extract_tracks(mode):
 
         if extract_cmds:
             print(f"Extracting from {mkv.name}...")
-            cmd = [MKVEXTRACT_EXE, "tracks", str(mkv)] + extract_cmds
-            run_command(cmd)
+            extract_jobs.append([MKVEXTRACT_EXE, "tracks", str(mkv)] + extract_cmds)
         else:
             print(f"Skipping extraction for {mkv.name} (files exist).")
 
+    # Each file extracts independently and silently, so run them side by side
+    if extract_jobs:
+        with ThreadPoolExecutor(max_workers=PARALLELISM) as ex:
+            list(ex.map(run_command, extract_jobs))
+
     return extracted_files
 
 
@@ -285,13 +305,19 @@ def display_loop():
     # Only write to STDOUT
     if sys.stdout.isatty():
         sys.stdout.write("\n" * PARALLELISM)
+        shown = [None] * PARALLELISM
         while not stop_display.is_set():
-            sys.stdout.write(f"\033[{PARALLELISM}A")
-            for i in range(PARALLELISM):
-                line = slot_status[i]
-                clean_line = line[:110].ljust(110)
-                sys.stdout.write(f"\r{clean_line}\n")
-            sys.stdout.flush()
+            # Repaint only the rows whose text changed, in a single write
+            current = [line[:110] for line in slot_status]
+            if current != shown:
+                out = [f"\033[{PARALLELISM}A"]
+                for line, old in zip(current, shown):
+                    if line != old:
+                        out.append(f"\r{line}\033[K")
+                    out.append("\n")
+                sys.stdout.write("".join(out))
+                sys.stdout.flush()
+                shown = current
             time.sleep(0.1)
 
 
@@ -319,165 +345,170 @@ def get_audio_channels(filepath):
         return "2"
 
 
-def worker_flac(slot_id):
+def worker_flac(slot_id, input_file):
     """Converts source audio to FLAC (Intermediate)."""
-    while True:
-        try:
-            input_file = files_queue.get_nowait()
-        except queue.Empty:
-            break
+    output_file = input_file.with_suffix(".flac")
+    fname = input_file.name[:25]
+    slot_status[slot_id] = f"{slot_id + 1}: [FLAC] {fname}.. Starting"
+
+    cmd = [
+        FFMPEG_EXE,
+        "-y",
+        "-threads",
+        str(FFMPEG_THREADS_PER_WORKER),
+        "-i",
+        str(input_file),
+        "-c:a",
+        "flac",
+        "-sample_fmt",
+        "s16",
+        "-compression_level",
+        "0",
+        "-threads",
+        str(FFMPEG_THREADS_PER_WORKER),
+        str(output_file),
+    ]
+
+    try:
+        proc = subprocess.Popen(
+            [str(c) for c in cmd],
+            stderr=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            encoding="utf-8",
+            errors="replace",
+        )
+        # Text mode splits ffmpeg's "\r" progress updates into lines
+        for line in proc.stderr:
+            match = re_ffmpeg.search(line)
+            if match:
+                t, b, s = match.groups()
+                slot_status[slot_id] = f"{slot_id + 1}: [FLAC] {fname}.. T:{t} Spd:{s}"
+        proc.wait()
+    except Exception as e:
+        slot_status[slot_id] = f"{slot_id + 1}: [Err] {str(e)[:20]}"
 
-        output_file = input_file.with_suffix(".flac")
-        fname = input_file.name[:25]
-        slot_status[slot_id] = f"{slot_id + 1}: [FLAC] {fname}.. Starting"
 
+def worker_opus(slot_id, input_file):
+    """Encodes FLAC to Opus."""
+    output_file = input_file.with_suffix(".opus")
+    fname = input_file.name[:25]
+
+    slot_status[slot_id] = f"{slot_id + 1}: [OPUS] {fname}.. Probing"
+    channels = get_audio_channels(input_file)
+
+    # Bitrate Strategy
+    bitrate = BITRATE_SETTINGS.get("2.0", "128")
+    display_ch = f"{channels}ch"
+
+    # Map nice display names
+    channel_map = {
+        "1": "1.0",
+        "2": "2.0",
+        "3": "2.1",
+        "4": "4.0",
+        "5": "5.0",
+        "6": "5.1",
+        "7": "6.1",
+        "8": "7.1",
+    }
+
+    try:
+        ch_int = int(channels)
+
+        # Use mapped name if available
+        if str(ch_int) in channel_map:
+            display_ch = f"{channel_map[str(ch_int)]}ch"
+
+        if ch_int > 6:
+            bitrate = BITRATE_SETTINGS.get("Above 5.1", "320")
+        elif ch_int >= 6:
+            bitrate = BITRATE_SETTINGS.get("5.1", "256")
+        elif ch_int >= 3:
+            bitrate = BITRATE_SETTINGS.get("2.1", "192")
+        else:
+            bitrate = BITRATE_SETTINGS.get("2.0", "128")
+    except:
+        pass
+
+    slot_status[slot_id] = f"{slot_id + 1}: [OPUS] {fname}.. Init"
+
+    # Check if opusenc exists, else use ffmpeg
+    use_ffmpeg = False
+    if "opusenc" not in OPUSENC_EXE and not Path(OPUSENC_EXE).exists():
+        use_ffmpeg = True
+
+    if use_ffmpeg:
         cmd = [
             FFMPEG_EXE,
             "-y",
+            "-threads",
+            str(FFMPEG_THREADS_PER_WORKER),
             "-i",
             str(input_file),
             "-c:a",
-            "flac",
-            "-sample_fmt",
-            "s16",
-            "-compression_level",
-            "0",
+            "libopus",
+            "-b:a",
+            f"{bitrate}k",
+            "-threads",
+            str(FFMPEG_THREADS_PER_WORKER),
             str(output_file),
         ]
+    else:
+        cmd = [OPUSENC_EXE, "--bitrate", bitrate, str(input_file), str(output_file)]
 
-        try:
-            proc = subprocess.Popen(
-                [str(c) for c in cmd],
-                stderr=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                text=True,
-                bufsize=1,
-                encoding="utf-8",
-                errors="replace",
-            )
-            while True:
-                chunk = proc.stderr.read(256)
-                if not chunk and proc.poll() is not None:
-                    break
-                if chunk:
-                    match = re_ffmpeg.search(chunk)
-                    if match:
-                        t, b, s = match.groups()
-                        slot_status[slot_id] = (
-                            f"{slot_id + 1}: [FLAC] {fname}.. T:{t} Spd:{s}"
-                        )
-        except Exception as e:
-            slot_status[slot_id] = f"{slot_id + 1}: [Err] {str(e)[:20]}"
-            continue
+    try:
+        proc = subprocess.Popen(
+            [str(c) for c in cmd],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            encoding="utf-8",
+            errors="replace",
+        )
 
-        files_queue.task_done()
-    slot_status[slot_id] = f"{slot_id + 1}: Idle"
+        # Both opusenc and ffmpeg report progress on stderr with "\r", which
+        # text mode splits into lines
+        for line in proc.stderr:
+            if not use_ffmpeg:
+                match = re_percent.search(line)
+                if match:
+                    pct = match.group(1)
+                    slot_status[slot_id] = f"{slot_id + 1}: [OPUS] {fname}.. {pct}%"
+            else:
+                # Simple ffmpeg progress
+                match = re_ffmpeg.search(line)
+                if match:
+                    t, b, s = match.groups()
+                    slot_status[slot_id] = f"{slot_id + 1}: [OPUS-FF] {fname}.. {t}"
+        proc.wait()
 
+    except Exception as e:
+        slot_status[slot_id] = f"{slot_id + 1}: [Err] {str(e)[:20]}"
 
-def worker_opus(slot_id):
-    """Encodes FLAC to Opus."""
-    while True:
-        try:
-            input_file = files_queue.get_nowait()
-        except queue.Empty:
-            break
-
-        output_file = input_file.with_suffix(".opus")
-        fname = input_file.name[:25]
-
-        slot_status[slot_id] = f"{slot_id + 1}: [OPUS] {fname}.. Probing"
-        channels = get_audio_channels(input_file)
-
-        # Bitrate Strategy
-        bitrate = BITRATE_SETTINGS.get("2.0", "128")
-        display_ch = f"{channels}ch"
-
-        # Map nice display names
-        channel_map = {
-            "1": "1.0",
-            "2": "2.0",
-            "3": "2.1",
-            "4": "4.0",
-            "5": "5.0",
-            "6": "5.1",
-            "7": "6.1",
-            "8": "7.1",
-        }
 
-        try:
-            ch_int = int(channels)
-
-            # Use mapped name if available
-            if str(ch_int) in channel_map:
-                display_ch = f"{channel_map[str(ch_int)]}ch"
-
-            if ch_int > 6:
-                bitrate = BITRATE_SETTINGS.get("Above 5.1", "320")
-            elif ch_int >= 6:
-                bitrate = BITRATE_SETTINGS.get("5.1", "256")
-            elif ch_int >= 3:
-                bitrate = BITRATE_SETTINGS.get("2.1", "192")
-            else:
-                bitrate = BITRATE_SETTINGS.get("2.0", "128")
-        except:
-            pass
-
-        slot_status[slot_id] = f"{slot_id + 1}: [OPUS] {fname}.. Init"
-
-        # Check if opusenc exists, else use ffmpeg
-        use_ffmpeg = False
-        if "opusenc" not in OPUSENC_EXE and not Path(OPUSENC_EXE).exists():
-            use_ffmpeg = True
-
-        if use_ffmpeg:
-            cmd = [
-                FFMPEG_EXE,
-                "-y",
-                "-i",
-                str(input_file),
-                "-c:a",
-                "libopus",
-                "-b:a",
-                f"{bitrate}k",
-                str(output_file),
-            ]
-        else:
-            cmd = [OPUSENC_EXE, "--bitrate", bitrate, str(input_file), str(output_file)]
+def run_slot(worker_func, input_file):
+    """Runs one file on a free display slot, then hands the slot back."""
+    slot_id = free_slots.get()
+    try:
+        worker_func(slot_id, input_file)
+    finally:
+        slot_status[slot_id] = f"{slot_id + 1}: Idle"
+        free_slots.put(slot_id)
 
-        try:
-            proc = subprocess.Popen(
-                [str(c) for c in cmd],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                encoding="utf-8",
-                errors="replace",
-            )
 
-            while True:
-                chunk = proc.stderr.read(10)  # Opusenc writes to stderr
-                if not chunk and proc.poll() is not None:
-                    break
-
-                if chunk and not use_ffmpeg:
-                    match = re.search(r"(\d+)%", chunk)
-                    if match:
-                        pct = match.group(1)
-                        slot_status[slot_id] = f"{slot_id + 1}: [OPUS] {fname}.. {pct}%"
-                elif use_ffmpeg and chunk:
-                    # Simple ffmpeg progress
-                    match = re_ffmpeg.search(chunk)
-                    if match:
-                        t, b, s = match.groups()
-                        slot_status[slot_id] = f"{slot_id + 1}: [OPUS-FF] {fname}.. {t}"
-
-        except Exception as e:
-            slot_status[slot_id] = f"{slot_id + 1}: [Err] {str(e)[:20]}"
-            continue
+def largest_first(files):
+    """Orders files biggest first so the longest encodes don't start last."""
+
+    def size(path):
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
 
-        files_queue.task_done()
-    slot_status[slot_id] = f"{slot_id + 1}: Idle"
+    return sorted(files, key=size, reverse=True)
 
 
 def run_phase(files, worker_func, name):
@@ -485,8 +516,6 @@ def run_phase(files, worker_func, name):
         return
     print(f"\n--- Starting {name} ({len(files)} files) ---")
 
-    for f in files:
-        files_queue.put(f)
     for i in range(PARALLELISM):
         slot_status[i] = "Waiting..."
 
@@ -494,17 +523,17 @@ def run_phase(files, worker_func, name):
     d_thread = threading.Thread(target=display_loop, daemon=True)
     d_thread.start()
 
-    threads = []
-    for i in range(PARALLELISM):
-        t = threading.Thread(target=worker_func, args=(i,))
-        t.start()
-        threads.append(t)
-
-    files_queue.join()
-    stop_display.set()
-    d_thread.join()
-    for t in threads:
-        t.join()
+    # One pool thread per display slot, so a free slot is always available
+    try:
+        with ThreadPoolExecutor(max_workers=PARALLELISM) as ex:
+            futures = [
+                ex.submit(run_slot, worker_func, f) for f in largest_first(files)
+            ]
+            for fut in futures:
+                fut.result()
+    finally:
+        stop_display.set()
+        d_thread.join()
 
     if sys.stdout.isatty():
         sys.stdout.write(f"\033[{PARALLELISM}B")
@@ -528,6 +557,7 @@ def mux_final_files():
 
     print(f"\n--- Starting Muxing Phase ---")
     files_processed = 0
+    mux_jobs = []
 
     # Iterate source files we found
     for stem, mkv_path in source_mkvs.items():
@@ -541,12 +571,10 @@ def mux_final_files():
             continue
 
         # Sort tracks by ID (filename pattern: name_trackID_lang.opus)
-        # re pattern: .*_track(\d+)_([a-zA-Z0-9]+)\.opus
         tracks_to_mux = []
-        pattern = re.compile(r".*_track(\d+)_([a-zA-Z0-9]+)\.opus$")
 
         for af in audio_files:
-            match = pattern.match(af.name)
+            match = re_opus_track.match(af.name)
             if match:
                 tracks_to_mux.append(
                     {"path": af, "id": int(match.group(1)), "lang": match.group(2)}
@@ -581,10 +609,17 @@ def mux_final_files():
                 ]
             )
 
-        if run_command(cmd):
+        mux_jobs.append((mkv_path.name, cmd))
+
+    # Muxes are silent and independent, so run several at once
+    with ThreadPoolExecutor(max_workers=MUX_WORKERS) as ex:
+        results = list(ex.map(run_command, [cmd for _, cmd in mux_jobs]))
+
+    for (name, _), ok in zip(mux_jobs, results):
+        if ok:
             files_processed += 1
         else:
-            print("  > Error during muxing.")
+            print(f"  > Error during muxing {name}.")
 
     print(f"\nAll done. Processed {files_processed} videos.")
 
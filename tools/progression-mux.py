@@ -1,10 +1,10 @@
 import os
 import subprocess
-import glob
 import sys
 import json
 import shutil
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 
 # --- GLOBALS & PATHS ---
@@ -31,27 +31,59 @@ if (
 ):  # fallback check for MediaInfo case sensitivity? Linux usually lower case
     pass
 
+# get_binary falls back to the bare name when the tool is nowhere to be found
+HAVE_MKVPROPEDIT = MKVPROPEDIT != "mkvpropedit"
 
-def run_command(cmd, status_label):
-    process = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        encoding="utf-8",
-    )
 
-    print(f"{status_label}: Starting...          ", end="\r")
-    sys.stdout.flush()
+def env_max_procs():
+    """AB_MAX_PROCS if it is a positive integer, else half the CPU threads (min 2)."""
+    try:
+        value = int(os.environ.get("AB_MAX_PROCS", ""))
+    except ValueError:
+        value = 0
+    return value if value > 0 else max(2, (os.cpu_count() or 2) // 2)
+
+
+# Files muxed at once; mkvmerge is mostly disk-bound, so keep it small
+MUX_WORKERS = min(4, env_max_procs())
+# Live "\r" progress lines only make sense on a terminal while one file is
+# muxing; redirected logs just get the "Done." lines
+IS_TTY = sys.stdout.isatty()
+LIVE_PROGRESS = IS_TTY
+
+
+def run_command(cmd, status_label):
+    if not LIVE_PROGRESS:
+        # Nobody sees the progress lines, so don't pipe them at all
+        process = subprocess.run(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    else:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+        )
 
-    for line in process.stdout:
-        line = line.strip()
-        if line.startswith("Progress:"):
-            percent = line.split(":")[-1].strip()
+        print(f"{status_label}: Starting...          ", end="\r")
+        sys.stdout.flush()
+
+        # Text mode already splits on "\r" as well as "\n"; only redraw the
+        # progress line when the percentage actually changes
+        last_percent = None
+        for line in process.stdout:
+            if not line.startswith("Progress:"):
+                continue
+            percent = line.partition(":")[2].strip()
+            if percent == last_percent:
+                continue
+            last_percent = percent
             print(f"{status_label}: {percent}          ", end="\r")
             sys.stdout.flush()
 
-    process.wait()
+        process.wait()
 
     if process.returncode != 0:
         print(f"\n[ERROR] Command failed: {' '.join(cmd)}")
@@ -60,18 +92,24 @@ def run_command(cmd, status_label):
     print(f"{status_label}: Done.          ")
 
 
-def force_vfr_metadata(file_path, status_label):
-    if not shutil.which("mkvpropedit") and not os.path.exists(MKVPROPEDIT):
+def force_vfr_metadata(file_path, status_label, video_track_count=None):
+    if not HAVE_MKVPROPEDIT:
         print(f"[WARN] mkvpropedit not found. Skipping metadata edit.")
         return
 
-    video_track_count = get_video_track_count(file_path) or 1
-    cmd = [MKVPROPEDIT, "--parse-mode", "full", file_path]
+    if video_track_count is None:
+        video_track_count = get_video_track_count(file_path)
+    video_track_count = video_track_count or 1
+
+    # The file was just written by mkvmerge, so its SeekHead points at the
+    # track headers; the default fast parse mode avoids reading the whole file
+    cmd = [MKVPROPEDIT, file_path]
     for i in range(1, video_track_count + 1):
         cmd.extend(["--edit", f"track:v{i}", "--delete", "default-duration"])
 
-    print(f"{status_label}: Updating...          ", end="\r")
-    sys.stdout.flush()
+    if LIVE_PROGRESS:
+        print(f"{status_label}: Updating...          ", end="\r")
+        sys.stdout.flush()
 
     try:
         subprocess.run(
@@ -114,143 +152,171 @@ def get_video_track_count(source_file):
 
 
 def check_vfr_mediainfo(source_file):
-    if not shutil.which("mediainfo") and not os.path.exists(MEDIAINFO):
-        # Try uppercase?
-        pass
-
     # Just try running whatever we found
     cmd = [MEDIAINFO, source_file]
     try:
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, encoding="utf-8", check=True
-        )
-        for line in result.stdout.splitlines():
-            if "frame rate mode" in line.lower() and "variable" in line.lower():
-                return True
+        # Stream the report and stop MediaInfo as soon as the answer is known
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        ) as proc:
+            for line in proc.stdout:
+                lower = line.lower()
+                if "frame rate mode" in lower and "variable" in lower:
+                    proc.terminate()
+                    return True
     except Exception as e:
         # print(f"[WARN] MediaInfo check failed: {e}")
         pass
     return False
 
 
-def mux_files():
-    av1_files = glob.glob("*-av1.mkv")
+def list_names(path):
+    """
+    Returns the entry names of a directory from a single read, so existence
+    checks become set lookups instead of one stat() each.
+    """
+    try:
+        with os.scandir(path) as it:
+            return {e.name for e in it}
+    except OSError:
+        return set()
 
-    if not av1_files:
-        print("No *-av1.mkv files found to mux.")
+
+def mux_one(av1_file, names):
+    base_name = av1_file.replace("-av1.mkv", "")
+
+    possible_sources = [f"{base_name}.mkv", f"{base_name}-source.mkv"]
+    source_mkv = None
+    for path in possible_sources:
+        if path in names:
+            source_mkv = path
+            break
+
+    if not source_mkv:
+        print(f"[SKIP] Source file not found for: {av1_file}")
         return
 
-    print(
-        f"Found {len(av1_files)} '-av1.mkv' files. Starting progression muxing process...\n"
-    )
+    final_output = f"{base_name}-output.mkv"
+    # Written under a temporary name so an interrupted run never leaves a
+    # partial file that looks up-to-date
+    part_output = f"{base_name}-output.part.mkv"
+    timestamp_file = f"{base_name}_timestamps.txt"
 
-    for av1_file in av1_files:
-        base_name = av1_file.replace("-av1.mkv", "")
+    # Re-runs skip outputs that are newer than their AV1 input
+    try:
+        if os.stat(final_output).st_mtime > os.stat(av1_file).st_mtime:
+            print(f"[SKIP] {final_output} up-to-date")
+            return
+    except OSError:
+        pass
 
-        possible_sources = [f"{base_name}.mkv", f"{base_name}-source.mkv"]
-        source_mkv = None
-        for path in possible_sources:
-            if os.path.exists(path):
-                source_mkv = path
-                break
+    try:
+        is_vfr = check_vfr_mediainfo(source_mkv)
+        timestamps_args = []
 
-        if not source_mkv:
-            print(f"[SKIP] Source file not found for: {av1_file}")
-            continue
+        total_steps = 3 if is_vfr else 1
+        current_step = 1
 
-        clean_video_mkv = f"{base_name}-video-only.mkv"
-        temp_audio_mkv = f"{base_name}_temp_no_video.mkv"
-        final_output = f"{base_name}-output.mkv"
-        timestamp_file = f"{base_name}_timestamps.txt"
+        if is_vfr:
+            print(
+                f"\033[92mVariable framerate detected, applying timecodes...\033[0m"
+            )
+            vid_track_id = get_video_track_id(source_mkv) or 0
+            cmd_extract_ts = [
+                MKVEXTRACT,
+                source_mkv,
+                "timestamps_v2",
+                f"{vid_track_id}:{timestamp_file}",
+            ]
+            run_command(
+                cmd_extract_ts,
+                f"[{base_name}] Step {current_step}/{total_steps} (Timecodes)",
+            )
+            current_step += 1
 
-        try:
-            is_vfr = check_vfr_mediainfo(source_mkv)
-            timestamps_args = []
-
-            total_steps = 5 if is_vfr else 3
-            current_step = 1
-
-            if is_vfr:
-                print(
-                    f"\033[92mVariable framerate detected, applying timecodes...\033[0m"
-                )
-                vid_track_id = get_video_track_id(source_mkv) or 0
-                cmd_extract_ts = [
-                    MKVEXTRACT,
-                    source_mkv,
-                    "timestamps_v2",
-                    f"{vid_track_id}:{timestamp_file}",
-                ]
-                run_command(
-                    cmd_extract_ts,
-                    f"[{base_name}] Step {current_step}/{total_steps} (Timecodes)",
-                )
-                current_step += 1
-
-            # Step 1: Clean AV1
-            cmd_clean = [
-                MKVMERGE,
-                "-o",
-                clean_video_mkv,
+        # Step 1: Merge video-only AV1 + Audio/Subs from source in one pass,
+        # without writing a cleaned video or audio-only temp file first
+        if is_vfr and os.path.exists(timestamp_file):
+            av1_track_id = get_video_track_id(av1_file) or 0
+            timestamps_args = ["--timestamps", f"{av1_track_id}:{timestamp_file}"]
+
+        cmd_merge = [MKVMERGE, "-o", part_output]
+        cmd_merge.extend(timestamps_args)
+        # Track selection flags apply to the file that follows them
+        cmd_merge.extend(
+            [
                 "--no-audio",
                 "--no-subtitles",
                 "--no-attachments",
                 "--no-chapters",
                 av1_file,
             ]
-            run_command(
-                cmd_clean,
-                f"[{base_name}] Step {current_step}/{total_steps} (Clean Video)",
-            )
-            current_step += 1
+        )
+        cmd_merge.extend(["--no-video", source_mkv])
 
-            # Step 2: Extract Audio/Subs
-            cmd_extract_audio = [
-                MKVMERGE,
-                "-o",
-                temp_audio_mkv,
-                "--no-video",
-                source_mkv,
-            ]
-            run_command(
-                cmd_extract_audio,
-                f"[{base_name}] Step {current_step}/{total_steps} (Extract Audio)",
+        run_command(
+            cmd_merge,
+            f"[{base_name}] Step {current_step}/{total_steps} (Merge Final)",
+        )
+        current_step += 1
+
+        # VFR Metadata Fix
+        if is_vfr:
+            # The source adds no video and av1an writes a single video track,
+            # so there is no need to identify the output again
+            force_vfr_metadata(
+                part_output,
+                f"[{base_name}] Step {current_step}/{total_steps} (VFR Fix)",
+                1,
             )
-            current_step += 1
 
-            # Step 3: Merge
-            if is_vfr and os.path.exists(timestamp_file):
-                clean_track_id = get_video_track_id(clean_video_mkv) or 0
-                timestamps_args = ["--timestamps", f"{clean_track_id}:{timestamp_file}"]
+        os.replace(part_output, final_output)
 
-            cmd_merge = [MKVMERGE, "-o", final_output]
-            cmd_merge.extend(timestamps_args)
-            cmd_merge.append(clean_video_mkv)
-            cmd_merge.append(temp_audio_mkv)
+        # Cleanup
+        try:
+            os.remove(timestamp_file)
+        except OSError:
+            pass
+
+    except subprocess.CalledProcessError:
+        print(f"\n[FAIL] Could not process {base_name}. Skipping.")
+    finally:
+        # Only still there if the run failed before os.replace
+        try:
+            os.remove(part_output)
+        except FileNotFoundError:
+            pass
 
-            run_command(
-                cmd_merge,
-                f"[{base_name}] Step {current_step}/{total_steps} (Merge Final)",
-            )
-            current_step += 1
 
-            # VFR Metadata Fix
-            if is_vfr:
-                force_vfr_metadata(
-                    final_output,
-                    f"[{base_name}] Step {current_step}/{total_steps} (VFR Fix)",
-                )
-
-            # Cleanup
-            for f in [clean_video_mkv, temp_audio_mkv, timestamp_file]:
-                if os.path.exists(f):
-                    try:
-                        os.remove(f)
-                    except OSError:
-                        pass
-
-        except subprocess.CalledProcessError:
-            print(f"\n[FAIL] Could not process {base_name}. Skipping.")
+def mux_files():
+    global LIVE_PROGRESS
+
+    # One directory read serves both the file list and the source lookups
+    names = list_names(".")
+    av1_files = sorted(
+        n for n in names if n.endswith("-av1.mkv") and not n.startswith(".")
+    )
+
+    if not av1_files:
+        print("No *-av1.mkv files found to mux.")
+        return
+
+    print(
+        f"Found {len(av1_files)} '-av1.mkv' files. Starting progression muxing process...\n"
+    )
+
+    workers = min(MUX_WORKERS, len(av1_files))
+    LIVE_PROGRESS = IS_TTY and workers == 1
+
+    # Each file only touches its own temp files, so files can mux in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for fut in [pool.submit(mux_one, f, names) for f in av1_files]:
+            fut.result()
 
 
 if __name__ == "__main__":
@@ -5,6 +5,9 @@ import subprocess
 import tempfile
 import sys
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from xml.sax.saxutils import escape
 
 
 # --- GLOBALS ---
@@ -27,16 +30,23 @@ def get_binary(name):
 
 
 MKVPROPEDIT = get_binary("mkvpropedit")
+# mkvpropedit runs are mostly process startup, so a few overlap well
+TAG_WORKERS = min(4, os.cpu_count() or 1)
 
 
+@lru_cache(maxsize=1)
 def get_5fish_folder():
     """Finds the 5fish folder name in tools/av1an."""
     base_path = os.path.join("tools", "av1an")
-    # Search for folder starting with 5fish-svt-av1-psy
-    pattern = os.path.join(base_path, "5fish-svt-av1-psy*")
-    folders = glob.glob(pattern)
-    if folders:
-        return os.path.basename(folders[0])
+    # Search for folder starting with 5fish-svt-av1-psy; scandir already
+    # has the names, so no pattern matching pass like glob
+    try:
+        with os.scandir(base_path) as it:
+            for entry in it:
+                if entry.name.startswith("5fish-svt-av1-psy"):
+                    return entry.name
+    except OSError:
+        pass
     return "5fish-svt-av1-psy_Unknown"
 
 
@@ -60,7 +70,7 @@ def get_active_batch_info():
 
     # Expected format: bat-used-[NAME].sh.txt or bat-used-[NAME].txt
     # 1. Remove prefix
-    temp_name = filename.replace("bat-used-", "")
+    temp_name = filename.removeprefix("bat-used-")
     # 2. Remove .txt suffix
     if temp_name.lower().endswith(".txt"):
         temp_name = temp_name[:-4]
@@ -172,8 +182,8 @@ def extract_dynamic_params(script_path):
     return params
 
 
-def apply_tag_to_file(filepath, tag_string):
-    """Generates XML and uses mkvpropedit to tag the file."""
+def write_tag_xml(tag_string):
+    """Writes the tag XML to a temp file once and returns its path."""
     xml_template = f"""<?xml version="1.0"?>
 <Tags>
   <Tag>
@@ -182,32 +192,43 @@ def apply_tag_to_file(filepath, tag_string):
     </Targets>
     <Simple>
       <Name>ENCODING_SETTINGS</Name>
-      <String>{tag_string}</String>
+      <String>{escape(tag_string)}</String>
     </Simple>
   </Tag>
 </Tags>
 """
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".xml", mode="w", encoding="utf-8"
-    ) as tmp:
-        tmp.write(xml_template)
-        tmp_path = tmp.name
+    # Small enough for a single raw write, no text wrapper needed
+    fd, tmp_path = tempfile.mkstemp(suffix=".xml")
+    try:
+        os.write(fd, xml_template.encode("utf-8"))
+    finally:
+        os.close(fd)
+    return tmp_path
 
+
+def apply_tag_xml(filepath, tmp_path):
+    """Uses mkvpropedit to apply the tag XML to the file."""
+    # Output is buffered so parallel runs don't interleave their lines
+    lines = [f"Applying tag to: {filepath}"]
     try:
-        print(f"Applying tag to: {filepath}")
         cmd = [MKVPROPEDIT, filepath, "--tags", "track:v1:" + tmp_path]
 
-        subprocess.run(cmd, check=True, capture_output=True)
-        print("Success.")
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        lines.append("Success.")
     except subprocess.CalledProcessError as e:
-        print(f"Error tagging {filepath}: {e}")
+        lines.append(f"Error tagging {filepath}: {e}")
         if e.stderr:
-            print(f"Details: {e.stderr.decode('utf-8')}")
+            lines.append(f"Details: {e.stderr}")
     except FileNotFoundError:
-        print(f"Error: {MKVPROPEDIT} not found.")
+        lines.append(f"Error: {MKVPROPEDIT} not found.")
     finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        print("\n".join(lines))
 
 
 def main():
@@ -249,8 +270,13 @@ def main():
     if not target_files:
         print("No output *-av1.mkv files found to tag.")
     else:
-        for f in target_files:
-            apply_tag_to_file(f, full_tag)
+        # Same tag for every file, so one XML serves them all
+        tag_xml = write_tag_xml(full_tag)
+        try:
+            with ThreadPoolExecutor(max_workers=TAG_WORKERS) as executor:
+                list(executor.map(lambda f: apply_tag_xml(f, tag_xml), target_files))
+        finally:
+            os.remove(tag_xml)
 
     if marker_path and os.path.exists(marker_path):
         try:
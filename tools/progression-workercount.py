@@ -4,6 +4,8 @@ import psutil
 import subprocess
 import time
 import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURATION ---
 # Base dir is tools/.. (which is Linux_Dist/)
@@ -12,21 +14,38 @@ AV1AN_PATH = "av1an"  # Assume system av1an or in path
 SAMPLE_FILE = os.path.join(BASE_DIR, "tools", "sample.mkv")
 CONFIG_FILE = os.path.join(BASE_DIR, "tools", "workercount-progression.txt")
 
+# RAM probe timing: sample quickly and stop once the encoder's RSS has
+# plateaued instead of always waiting out the full budget
+MONITOR_SECONDS = 20
+SAMPLE_INTERVAL = 0.1
+SETTLE_SECONDS = 3
+STABLE_SAMPLES = 10
+# Two workers reach their peak together, and splitting the total between
+# them separates av1an's own overhead from the per-encoder cost
+PROBE_WORKERS = 2
+CLEANUP_WORKERS = min(8, os.cpu_count() or 1)
+
 
 def cleanup_temp_folders():
     """Deletes temp folders and the test output file."""
     print("Cleaning up temporary test files...", file=sys.stderr)
 
-    # 1. Clean up folders starting with a period
+    # 1. Clean up folders starting with a period (in parallel, each rmtree
+    # is independent I/O)
     try:
-        for item in os.listdir(BASE_DIR):
-            item_path = os.path.join(BASE_DIR, item)
-            if os.path.isdir(item_path) and item.startswith("."):
-                try:
-                    shutil.rmtree(item_path)
-                except OSError:
-                    pass
-    except Exception as e:
+        with os.scandir(BASE_DIR) as entries:
+            targets = [
+                e.path
+                for e in entries
+                if e.name.startswith(".") and e.is_dir(follow_symlinks=False)
+            ]
+        if targets:
+            workers = min(CLEANUP_WORKERS, len(targets))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                executor.map(
+                    lambda path: shutil.rmtree(path, ignore_errors=True), targets
+                )
+    except Exception:
         pass
 
     # 2. Clean up the test output video file
@@ -38,20 +57,28 @@ def cleanup_temp_folders():
             pass
 
 
+def is_encoder(proc):
+    """True if the process is an SVT-AV1 encoder spawned by av1an."""
+    try:
+        return "svt" in proc.name().lower()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+
+
 def get_optimal_workers():
     print(
         f"Running one-time RAM test (Preset 2) on {os.path.basename(SAMPLE_FILE)}...",
         file=sys.stderr,
     )
 
-    # 1. Start the test process with 1 worker using PRESET 2
+    # 1. Start the test process with PROBE_WORKERS workers using PRESET 2
     cmd = [
         AV1AN_PATH,
         "-i",
         SAMPLE_FILE,
         "-y",
         "--workers",
-        "1",
+        str(PROBE_WORKERS),
         "--verbose",
         "-e",
         "svt-av1",
@@ -66,19 +93,41 @@ def get_optimal_workers():
         return 1
 
     max_total_rss = 0
+    parent_base = 0
+    peak_encoders = 0
 
     try:
-        # Monitor for up to 20 seconds
-        for _ in range(40):
+        # Monitor for up to MONITOR_SECONDS, leaving early once RSS is flat
+        parent = None
+        children = []
+        next_walk = 0.0
+        encoder_since = None
+        encoders = 0
+        recent = deque(maxlen=STABLE_SAMPLES)
+        start = time.monotonic()
+        while time.monotonic() - start < MONITOR_SECONDS:
             if process.poll() is not None:
                 break
 
             try:
-                current_rss = 0
-                parent = psutil.Process(process.pid)
-                current_rss += parent.memory_info().rss
-
-                for child in parent.children(recursive=True):
+                if parent is None:
+                    parent = psutil.Process(process.pid)
+                current_rss = parent.memory_info().rss
+                if encoder_since is None:
+                    # av1an on its own, before any encoder has started
+                    parent_base = current_rss
+
+                # av1an starts its encoders once, so after all of them show
+                # up the child tree only needs re-walking every 2 seconds
+                now = time.monotonic()
+                if now >= next_walk:
+                    children = parent.children(recursive=True)
+                    encoders = sum(map(is_encoder, children))
+                    if encoder_since is None and encoders:
+                        encoder_since = now
+                    next_walk = now + (2.0 if encoders >= PROBE_WORKERS else 0.5)
+
+                for child in children:
                     try:
                         current_rss += child.memory_info().rss
                     except (psutil.NoSuchProcess, psutil.AccessDenied):
@@ -86,11 +135,23 @@ def get_optimal_workers():
 
                 if current_rss > max_total_rss:
                     max_total_rss = current_rss
+                    peak_encoders = encoders
+
+                # Peak reached: the encoder has run for a few seconds and the
+                # last samples all sit within 1% of the maximum
+                recent.append(current_rss)
+                if (
+                    encoder_since is not None
+                    and now - encoder_since >= SETTLE_SECONDS
+                    and len(recent) == STABLE_SAMPLES
+                    and min(recent) >= max_total_rss * 0.99
+                ):
+                    break
 
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 pass
 
-            time.sleep(0.5)
+            time.sleep(SAMPLE_INTERVAL)
     finally:
         if process.poll() is None:
             process.kill()
@@ -107,8 +168,12 @@ def get_optimal_workers():
     # Math: Leave 10% of TOTAL RAM free
     safe_ram_limit = total_ram * 0.90
 
+    # Per-worker cost: peak minus av1an's own RSS, split over the encoders
+    # that were running at the peak (the sample may only fit one chunk)
+    per_worker_rss = max(1, (max_total_rss - parent_base) / max(1, peak_encoders))
+
     # Calculate Max Workers by RAM
-    max_workers_ram = int(safe_ram_limit / max_total_rss)
+    max_workers_ram = int((safe_ram_limit - parent_base) / per_worker_rss)
 
     # Calculate Max Workers by CPU (Threads / 3)
     max_workers_cpu = int(cpu_threads / 3)
@@ -119,7 +184,8 @@ def get_optimal_workers():
 
     print("\n------------------------------------------------")
     print(f"   - Total System RAM: {total_ram // (1024**2)} MB")
-    print(f"   - Peak RAM (1 Worker, Preset 2): {max_total_rss // (1024**2)} MB")
+    print(f"   - av1an Base RAM: {parent_base // (1024**2)} MB")
+    print(f"   - RAM per Worker (Preset 2): {int(per_worker_rss) // (1024**2)} MB")
     print(f"   - CPU Threads: {cpu_threads}")
     print(f"   - Calculated Optimal Workers (Safe - 1): {final_workers}")
     print("------------------------------------------------")
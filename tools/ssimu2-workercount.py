@@ -9,6 +9,7 @@ import concurrent.futures
 import gc
 import platform
 import random
+import threading
 from pathlib import Path
 import vapoursynth as vs
 
@@ -21,6 +22,9 @@ TEMP_DIR = TOOLS_DIR / "ssimu2_bench_temp"
 
 # Benchmark Settings
 SKIP = 3
+# vs-hip numStream values tried in a short sweep before the timed run
+VSHIP_STREAM_SWEEP = (2, 4, 8)
+VSHIP_DEFAULT_STREAMS = 3
 
 try:
     from vstools import core, clip_async_render
@@ -29,15 +33,19 @@ except ImportError:
     sys.exit(1)
 
 
-def cleanup_temp_files():
-    """Removes temporary benchmark files and directories."""
+def cleanup_temp_files(release_memory=True):
+    """
+    Removes temporary benchmark files and directories. release_memory also
+    drops the VS cache and runs the GC, which is pointless at startup.
+    """
     # 1. Clear VS Cache
-    try:
-        if hasattr(vs.core, "clear_cache"):
-            vs.core.clear_cache()
-    except:
-        pass
-    gc.collect()
+    if release_memory:
+        try:
+            if hasattr(vs.core, "clear_cache"):
+                vs.core.clear_cache()
+        except:
+            pass
+        gc.collect()
 
     # 2. Remove Benchmark Temp Dir
     if TEMP_DIR.exists():
@@ -126,10 +134,12 @@ def calculate_optimal_count(fps, rss_per_worker):
 def benchmark_gpu_vship(encoded_file):
     """
     Benchmarks vs-hip on Linux. Unlike Windows, we don't manage DLLs.
-    We just check if the plugin is loaded and usable.
+    We just check if the plugin is loaded and usable. A short numStream
+    sweep picks the stream count for the timed run.
+    Returns (fps, numStream).
     """
     if not hasattr(core, "vship"):
-        return -1
+        return -1, VSHIP_DEFAULT_STREAMS
 
     print("   Benchmarking GPU (vs-hip)...", file=sys.stderr)
 
@@ -146,30 +156,35 @@ except:
 core = vs.core
 SKIP = {SKIP}
 
-try:
-    # We strip path details for safety, re-loading paths
+def measure(streams, duration):
+    # Fresh source nodes each time, so no run reads frames cached by another
     src = core.ffms2.Source(source=r"{SAMPLE_FILE}").resize.Bicubic(format=vs.RGB24, matrix_in_s="709")[::SKIP]
     enc = core.ffms2.Source(source=r"{encoded_file}").resize.Bicubic(format=vs.RGB24, matrix_in_s="709")[::SKIP]
-    
+
     # Init vship
-    res = core.vship.SSIMULACRA2(src, enc, numStream = 3)
-    
+    res = core.vship.SSIMULACRA2(src, enc, numStream = streams)
+
     start = time.time()
     frames = [0]
-    duration = 10.0
-    
+
     def p(n, t):
         frames[0] = n
         elapsed = time.time() - start
         if elapsed > duration: raise KeyboardInterrupt
-        
+
     try:
         clip_async_render(res, outfile=None, progress=p)
     except:
         pass
-        
+
     elapsed = time.time() - start
-    fps = frames[0] / elapsed if elapsed > 0 else 0
+    return frames[0] / elapsed if elapsed > 0 else 0
+
+try:
+    # Short sweep for the stream count, then the timed run at the best one
+    best = max({VSHIP_STREAM_SWEEP}, key=lambda n: measure(n, 3.0))
+    fps = measure(best, 10.0)
+    print(f"STREAMS:{{best}}")
     print(f"FPS:{{fps}}")
 except Exception as e:
     print(f"ERROR:{{e}}")
@@ -182,12 +197,15 @@ except Exception as e:
             text=True,
             cwd=BASE_DIR,
         )
+        streams = VSHIP_DEFAULT_STREAMS
         for line in res.stdout.splitlines():
-            if line.startswith("FPS:"):
-                return float(line.split(":")[1])
+            if line.startswith("STREAMS:"):
+                streams = int(line.split(":")[1])
+            elif line.startswith("FPS:"):
+                return float(line.split(":")[1]), streams
     except:
         pass
-    return 0
+    return 0, VSHIP_DEFAULT_STREAMS
 
 
 def benchmark_cpu_fssimu2(encoded_file):
@@ -223,17 +241,26 @@ def _run_fssimu2_internal(workers, encoded_file, duration, exe_path):
     dist = enc_full.resize.Bicubic(format=vs.RGB24, matrix_in_s="709")[::SKIP]
 
     total_frames = len(ref)
+    TEMP_DIR.mkdir(exist_ok=True)
+
+    header = (
+        f"P7\nWIDTH {ref.width}\nHEIGHT {ref.height}\nDEPTH 3\nMAXVAL 255\nTUPLTYPE RGB\nENDHDR\n"
+    ).encode()
+    local = threading.local()
 
     def write_pam(frame, filepath):
-        packed = np.dstack(
-            (np.asarray(frame[0]), np.asarray(frame[1]), np.asarray(frame[2]))
-        ).tobytes()
-        header = (
-            f"P7\nWIDTH {frame.width}\nHEIGHT {frame.height}\nDEPTH 3\nMAXVAL 255\nTUPLTYPE RGB\nENDHDR\n"
-        ).encode()
+        # Each worker thread packs into its own header+pixels buffer, so a
+        # frame is one write and no per-frame allocation
+        if not hasattr(local, "buf"):
+            local.buf = bytearray(len(header) + frame.width * frame.height * 3)
+            local.buf[: len(header)] = header
+            local.pixels = np.frombuffer(
+                local.buf, dtype=np.uint8, offset=len(header)
+            ).reshape(frame.height, frame.width, 3)
+        for plane in range(3):
+            local.pixels[..., plane] = np.asarray(frame[plane])
         with open(filepath, "wb") as f:
-            f.write(header)
-            f.write(packed)
+            f.write(local.buf)
 
     def process_frame(n):
         r_path = TEMP_DIR / f"ref_{n}.pam"
@@ -241,10 +268,12 @@ def _run_fssimu2_internal(workers, encoded_file, duration, exe_path):
         try:
             write_pam(ref.get_frame(n), r_path)
             write_pam(dist.get_frame(n), d_path)
-            # Linux: shell=False is usually safer/better if lists are used
+            # Spawned the way Auto-Boost-Av1an.py does it (captured, decoded
+            # output), so the benchmark times the real per-frame cost
             subprocess.run(
                 [str(exe_path), str(r_path), str(d_path)],
                 capture_output=True,
+                text=True,
                 check=True,
             )
         finally:
@@ -359,7 +388,7 @@ def _run_vszip_internal(workers, encoded_file, duration):
 
 if __name__ == "__main__":
     try:
-        cleanup_temp_files()
+        cleanup_temp_files(release_memory=False)
         encoded_file = run_fast_pass()
         if not encoded_file:
             raise RuntimeError("Fast pass failed")
@@ -367,9 +396,12 @@ if __name__ == "__main__":
         results = []
 
         # 1. Test vs-hip (GPU)
-        fps_gpu = benchmark_gpu_vship(encoded_file)
+        fps_gpu, vship_streams = benchmark_gpu_vship(encoded_file)
         if fps_gpu > 0:
-            print(f"   [vs-hip]        FPS: {fps_gpu:.2f}", file=sys.stderr)
+            print(
+                f"   [vs-hip]        FPS: {fps_gpu:.2f} | Streams: {vship_streams}",
+                file=sys.stderr,
+            )
             results.append(
                 {"tool": "vs-hip", "variant": "gpu", "fps": fps_gpu, "workers": 1}
             )
@@ -411,6 +443,9 @@ if __name__ == "__main__":
         with open(CONFIG_FILE, "w") as f:
             f.write(f"tool={winner['tool']}\n")
             f.write(f"workercount={winner['workers']}\n")
+            # Honoured whenever vs-hip runs, including as the auto fallback
+            if fps_gpu > 0:
+                f.write(f"numstream={vship_streams}\n")
 
     except Exception as e:
         print(f"Fatal error: {e}", file=sys.stderr)
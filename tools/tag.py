@@ -1,29 +1,54 @@
 import os
-import glob
 import re
 import subprocess
 import shutil
-import platform
 import tempfile
 import shlex
-
-
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# Name of the encoder entry script on a batch/shell command line
+SCRIPT_RE = re.compile(r"dispatch\.py|auto-boost-av1an\.py", re.IGNORECASE)
+# First non-comment line that invokes the entry script
+COMMAND_LINE_RE = re.compile(
+    r"^[ \t]*([^#\s][^\n]*?(?:dispatch|auto-boost-av1an)\.py[^\n]*)",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Version strings in Auto-Boost-Av1an.py / readme.txt, and how much of
+# each file to read when looking for them
+VER_STR_RE = re.compile(rb'^ver_str\s*=\s*"([^"]+)"', re.MULTILINE)
+README_VERSION_RE = re.compile(rb"v(\d+\.\d+)")
+VERSION_HEAD_BYTES = 8192
+# Marker files left in tools/ by the .bat/.sh launchers
+MARKER_PREFIXES = ("bat-used-", "sh-used-")
+# Display strings for the named --quality presets
+CRF_STRINGS = {
+    "high": "--crf 25(variable)",
+    "medium": "--crf 30(variable)",
+    "low": "--crf 35(variable)",
+}
+# mkvpropedit runs are mostly process startup, so a few overlap well
+TAG_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@lru_cache(maxsize=1)
 def get_script_version():
     """Extracts the latest version number from Auto-Boost-Av1an.py or readme.txt."""
     # First try Auto-Boost-Av1an.py
     script_path = "Auto-Boost-Av1an.py"
     version = "Unknown"
 
+    # Both version strings sit near the top, so only the head is read
     if os.path.exists(script_path):
         try:
-            with open(script_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                # ver_str = "v2.9.20 (Clean UI)"
-                match = re.search(r'ver_str\s*=\s*"([^"]+)"', content)
-                if match:
-                    version = match.group(1).split(" ")[
-                        0
-                    ]  # Take "v2.9.20" from "v2.9.20 (Clean UI)"
+            with open(script_path, "rb") as f:
+                head = f.read(VERSION_HEAD_BYTES)
+            # ver_str = "v2.9.20 (Clean UI)"
+            match = VER_STR_RE.search(head)
+            if match:
+                # Take "v2.9.20" from "v2.9.20 (Clean UI)"
+                version = match.group(1).decode("utf-8").split(" ")[0]
         except Exception:
             pass
 
@@ -31,24 +56,19 @@ def get_script_version():
         readme_path = "readme.txt"
         if os.path.exists(readme_path):
             try:
-                with open(readme_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    match = re.search(r"v(\d+\.\d+)", content)
-                    if match:
-                        version = "v" + match.group(1)
+                with open(readme_path, "rb") as f:
+                    head = f.read(VERSION_HEAD_BYTES)
+                match = README_VERSION_RE.search(head)
+                if match:
+                    version = "v" + match.group(1).decode("ascii")
             except Exception:
                 pass
     return version
 
 
-def resolve_variables(val):
-    """
-    Resolves known shell variables like $SSIMU2_TOOL, $SSIMU2_WORKERS.
-    """
-    if not val or "$" not in val:
-        return val
-
-    # Common variables map
+@lru_cache(maxsize=None)
+def load_shell_variables():
+    """Reads the shell variable values once from the SSIMU2 config."""
     vars_map = {}
 
     # Load SSIMU2 config if available
@@ -61,6 +81,8 @@ def resolve_variables(val):
                         vars_map["SSIMU2_TOOL"] = line.split("=", 1)[1].strip()
                     if line.startswith("workercount="):
                         vars_map["SSIMU2_WORKERS"] = line.split("=", 1)[1].strip()
+                    if line.startswith("numstream="):
+                        vars_map["VSHIP_STREAMS"] = line.split("=", 1)[1].strip()
         except:
             pass
 
@@ -69,14 +91,28 @@ def resolve_variables(val):
         vars_map["SSIMU2_TOOL"] = "vs-zip"  # Default fallback
     if "SSIMU2_WORKERS" not in vars_map:
         vars_map["SSIMU2_WORKERS"] = "4"
+    if "VSHIP_STREAMS" not in vars_map:
+        vars_map["VSHIP_STREAMS"] = "3"
+
+    return vars_map
+
+
+def resolve_variables(val):
+    """
+    Resolves known shell variables like $SSIMU2_TOOL, $SSIMU2_WORKERS,
+    $VSHIP_STREAMS.
+    """
+    if not val or "$" not in val:
+        return val
 
     # Replace
-    for k, v in vars_map.items():
+    for k, v in load_shell_variables().items():
         val = val.replace(f"${k}", v).replace(f"${{{k}}}", v)
 
     return val
 
 
+@lru_cache(maxsize=1)
 def get_5fish_version():
     """Gets the SVT-AV1-PSY version from the installed binary."""
     # On Linux, s-a-p is installed to system PATH (SvtAv1EncApp)
@@ -105,9 +141,18 @@ def get_5fish_version():
 def get_active_batch_filename():
     """Scans tools/ folder for the marker file created by the .bat/.sh script."""
     # Look for files like tools/bat-used-batch.bat.txt or tools/sh-used-run.sh.txt
-    pattern_bat = os.path.join("tools", "bat-used-*.txt")
-    pattern_sh = os.path.join("tools", "sh-used-*.txt")
-    files = glob.glob(pattern_bat) + glob.glob(pattern_sh)
+    # in a single directory read
+    try:
+        with os.scandir("tools") as entries:
+            files = [
+                e.path
+                for e in entries
+                if e.name.startswith(MARKER_PREFIXES)
+                and e.name.endswith(".txt")
+                and e.is_file()
+            ]
+    except OSError:
+        files = []
 
     if not files:
         print(
@@ -119,9 +164,9 @@ def get_active_batch_filename():
     filename = os.path.basename(marker_file)
 
     # Remove prefix "bat-used-" or "sh-used-" and suffix ".txt"
-    batch_name = (
-        filename.replace("bat-used-", "").replace("sh-used-", "").replace(".txt", "")
-    )
+    batch_name = filename.removesuffix(".txt")
+    for prefix in MARKER_PREFIXES:
+        batch_name = batch_name.removeprefix(prefix)
 
     try:
         os.remove(marker_file)
@@ -151,7 +196,7 @@ def parse_batch_line(line):
     # Locate where the dispatch script starts
     start_idx = -1
     for i, part in enumerate(parts):
-        if "dispatch.py" in part or "Auto-Boost-Av1an.py" in part:
+        if SCRIPT_RE.search(part):
             start_idx = i
             break
 
@@ -238,20 +283,12 @@ def parse_batch_line(line):
 def get_crf_string(quality):
     """Maps quality string/number to CRF display string."""
     q = str(quality).lower().strip()
-    if q == "high":
-        return "--crf 25(variable)"
-    if q == "low":
-        return "--crf 35(variable)"
-    if q == "medium":
-        return "--crf 30(variable)"
-    try:
-        return f"--crf {q}(variable)"
-    except ValueError:
-        return "--crf 30(variable)"
+    # Named presets map to fixed CRFs; anything else is a numeric CRF
+    return CRF_STRINGS.get(q) or f"--crf {q}(variable)"
 
 
-def apply_tag_to_file(filepath, encoding_settings):
-    """Writes a temp XML and applies it to the MKV file via mkvpropedit."""
+def write_tag_xml(encoding_settings):
+    """Writes the tag XML to a temp file once and returns its path."""
     xml_template = f"""<?xml version="1.0"?>
 <Tags>
   <Tag>
@@ -260,39 +297,45 @@ def apply_tag_to_file(filepath, encoding_settings):
     </Targets>
     <Simple>
       <Name>ENCODING_SETTINGS</Name>
-      <String>{encoding_settings}</String>
+      <String>{escape(encoding_settings)}</String>
     </Simple>
   </Tag>
 </Tags>
 """
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".xml", mode="w", encoding="utf-8"
-    ) as tmp:
-        tmp.write(xml_template)
-        tmp_path = tmp.name
+    # Small enough for a single raw write, no text wrapper needed
+    fd, tmp_path = tempfile.mkstemp(suffix=".xml")
+    try:
+        os.write(fd, xml_template.encode("utf-8"))
+    finally:
+        os.close(fd)
+    return tmp_path
 
+
+def apply_tag_xml(filepath, tmp_path, mkvpropedit_exe):
+    """Applies the tag XML written by write_tag_xml to the MKV file."""
+    # Output is buffered so parallel runs don't interleave their lines
+    lines = [f"Applying tag to: {filepath}"]
     try:
-        print(f"Applying tag to: {filepath}")
-        mkvpropedit_exe = shutil.which("mkvpropedit")
         if not mkvpropedit_exe:
-            print("Error: mkvpropedit not found in PATH")
+            lines.append("Error: mkvpropedit not found in PATH")
             return
 
         subprocess.run(
             [mkvpropedit_exe, filepath, "--tags", "track:v1:" + tmp_path],
             check=True,
-            capture_output=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
         )
-        print("Success.")
+        lines.append("Success.")
     except subprocess.CalledProcessError as e:
-        print(f"Error tagging {filepath}: {e}")
+        lines.append(f"Error tagging {filepath}: {e}")
         if e.stderr:
-            print(f"Details: {e.stderr.decode('utf-8')}")
+            lines.append(f"Details: {e.stderr}")
     except Exception as e:
-        print(f"Error: {e}")
+        lines.append(f"Error: {e}")
     finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        print("\n".join(lines))
 
 
 def main():
@@ -331,13 +374,10 @@ def main():
                 # Join lines ending with backslash
                 full_content = full_content.replace("\\\n", " ")
 
-                for line in full_content.splitlines():
-                    strip = line.strip().lower()
-                    if (not strip.startswith("#")) and (
-                        "dispatch.py" in strip or "auto-boost-av1an.py" in strip
-                    ):
-                        cmd_line = line.strip()
-                        break
+                # One scan over the whole script instead of a loop per line
+                match = COMMAND_LINE_RE.search(full_content)
+                if match:
+                    cmd_line = match.group(1).strip()
         except Exception as e:
             print(f"Warning: Could not read script file: {e}")
 
@@ -371,33 +411,36 @@ def main():
     )
 
     # 5. Apply
-    found = False
-    for root, _, files in os.walk("."):
+    # Search for MKV files that look like final outputs (Windows tags
+    # "*-output.mkv"; Auto-Boost-Av1an.py writes "*-av1.mkv"). Hidden
+    # folders such as av1an/Auto-Boost temp dirs only hold chunk files,
+    # so they are pruned instead of walked.
+    # The tag is the same for every file: write its XML and find
+    # mkvpropedit once for the whole run
+    targets = []
+    for root, dirs, files in os.walk("."):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
         for f in files:
-            if f.lower().endswith("-av1.mkv") or f.lower().endswith("-output.mkv"):
-                # Note: Windows script checks -output.mkv, but linux script produces -av1.mkv then muxes to something else?
-                # run_linux.sh -> output is defined in mux.py.
-                # mux.py usually creates "*-muxed.mkv"? Or overwrite source?
-                # The user's tag.py in Win searches for "*-output.mkv".
-                # In Logic: output_dir / f"{src_file.stem}-av1.mkv" (Auto-Boost-Av1an.py)
-                # mux.py creates the final file.
-                # Let's check typical flow.
-                pass
-
-    # Actually, let's keep it simple: Search for MKV files that look like outputs.
-    # In Linux_Dist/tools/mux.py, let's see what it outputs.
-    # But for now, I'll search for the same pattern as Windows + maybe "-av1.mkv"
-
-    for root, _, files in os.walk("."):
-        for f in files:
-            # We want to tag the FINAL output.
-            if f.lower().endswith("-output.mkv") or f.lower().endswith("-av1.mkv"):
-                found = True
-                full_path = os.path.join(root, f)
-                apply_tag_to_file(full_path, full_string)
+            name = f.lower()
+            if name.endswith("-output.mkv") or name.endswith("-av1.mkv"):
+                targets.append(os.path.join(root, f))
 
-    if not found:
+    if not targets:
         print("No output MKV files found to tag.")
+        return
+
+    mkvpropedit_exe = shutil.which("mkvpropedit")
+    tag_xml = write_tag_xml(full_string)
+    try:
+        with ThreadPoolExecutor(max_workers=TAG_WORKERS) as executor:
+            list(
+                executor.map(
+                    lambda path: apply_tag_xml(path, tag_xml, mkvpropedit_exe),
+                    targets,
+                )
+            )
+    finally:
+        os.remove(tag_xml)
 
 
 if __name__ == "__main__":